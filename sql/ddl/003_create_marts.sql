@@ -84,4 +84,32 @@ SELECT
   MEDIAN(price) AS median_price
 FROM stg.ppd_clean_valid
 GROUP BY 1, 2
-ORDER BY sales_volume DESC;
\ No newline at end of file
+ORDER BY sales_volume DESC;
+
+-- 7) Mergeable monthly aggregates (additive: any date range can be re-aggregated by summing rows)
+DROP TABLE IF EXISTS mart.monthly_kpi_aggregates;
+CREATE TABLE mart.monthly_kpi_aggregates AS
+SELECT
+  DATE_TRUNC('month', date_of_transfer) AS month,
+  COUNT(*)                               AS n,
+  SUM(price)                             AS sum_price,
+  SUM(price::DOUBLE * price::DOUBLE)     AS sum_price_sq,
+  MIN(price)                             AS min_price,
+  MAX(price)                             AS max_price,
+  SUM(is_new_build)                      AS n_new_build,
+  SUM(is_freehold)                       AS n_freehold
+FROM stg.ppd_clean_valid
+GROUP BY 1
+ORDER BY 1;
+
+-- 8) Monthly price quantile sketch (log-spaced buckets, ~2% relative error on any quantile)
+-- bucket i holds prices in (gamma^(i-1), gamma^i] with gamma = 1.02 / 0.98
+DROP TABLE IF EXISTS mart.monthly_price_sketch;
+CREATE TABLE mart.monthly_price_sketch AS
+SELECT
+  DATE_TRUNC('month', date_of_transfer)                AS month,
+  CAST(CEIL(LN(price) / LN(1.02 / 0.98)) AS INTEGER)   AS bucket,
+  COUNT(*)                                             AS n
+FROM stg.ppd_clean_valid
+GROUP BY 1, 2
+ORDER BY 1, 2;
@@ -0,0 +1,34 @@
+CREATE SCHEMA IF NOT EXISTS mart;
+
+-- Aggregates over mart.transaction_residuals (written by src.modeling.residual_district).
+-- residual = actual log_price - predicted log_price: positive => sold above the model's price.
+
+DROP TABLE IF EXISTS mart.district_residuals;
+
+CREATE TABLE mart.district_residuals AS
+SELECT
+  county,
+  district,
+  COUNT(*) AS n,
+  AVG(residual) AS mean_residual,
+  MEDIAN(residual) AS median_residual,
+  STDDEV_SAMP(residual) AS std_residual,
+  AVG(ABS(residual)) AS mean_abs_residual,
+  AVG(CASE WHEN residual > 0 THEN 1 ELSE 0 END) AS share_above_model
+FROM mart.transaction_residuals
+GROUP BY 1,2;
+
+DROP TABLE IF EXISTS mart.district_month_residuals;
+
+CREATE TABLE mart.district_month_residuals AS
+SELECT
+  county,
+  district,
+  year,
+  month,
+  MAKE_DATE(year, month, 1) AS month_start,
+  COUNT(*) AS n,
+  AVG(residual) AS mean_residual,
+  MEDIAN(residual) AS median_residual
+FROM mart.transaction_residuals
+GROUP BY 1,2,3,4;
@@ -13,9 +13,12 @@ TABLES = [
     "mart.property_type_kpis",
     "mart.county_kpis",
     "mart.district_kpis",
+    "mart.monthly_kpi_aggregates",
+    "mart.monthly_price_sketch",
 
     "mart.monthly_kpis_yoy",
     "mart.seasonality_month",
+    "mart.decomposition_strength",
     "mart.price_index_monthly",
     "mart.monthly_by_property_type",
     "mart.monthly_by_county",
@@ -35,6 +38,11 @@ TABLES = [
     "mart.monthly_by_type_tenure",
 
     "mart.district_segments",
+    "mart.district_residuals",
+    "mart.district_month_residuals",
+    "mart.forecasts",
+    "mart.baseline_forecasts",
+    "mart.forecast_backtest_metrics",
 ]
 
 con = duckdb.connect(DB)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import os
+import warnings
+from functools import partial
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from joblib import Parallel, delayed, parallel_config
+
+from src.modeling.baseline_forecast import BASELINES, forecast_mean
+from src.modeling.forecast_batch import load_panel, forecast_series, TARGETS, SEASON
+from src.modeling.profiling import StageTimer
+
+load_dotenv()
+
+# Rolling-origin forecast backtesting (make backtest).
+#
+# For every origin o (the last N_ORIGINS origins, STEP months apart) each model sees the months
+# before o and forecasts HORIZON months ahead. A forecaster maps a (series x months) history
+# panel to a (series x HORIZON) forecast panel, so vectorised models run a whole panel at once
+# and per-series models (SARIMAX) are split into chunks of SERIES_CHUNK across the pool.
+# Forecasts are stacked into (origin x horizon x series) arrays per model and target, and the
+# metrics are computed on those arrays in one pass. MASE scales by each series' in-sample
+# seasonal naive MAE at that origin.
+#
+# mart.forecast_backtest_metrics: one row per (model, target, series, horizon), averaged over
+# origins; reports/forecast_backtest_summary.csv rolls it up by level and horizon.
+
+HORIZON = 12
+N_ORIGINS = int(os.getenv("BACKTEST_ORIGINS", "8"))
+STEP = int(os.getenv("BACKTEST_STEP", "3"))
+MODELS = os.getenv("BACKTEST_MODELS", "seasonal_naive,drift,ses,holt_winters,sarimax").split(",")
+LEVELS = os.getenv("BACKTEST_LEVELS", "national,county,district").split(",")
+SERIES_CHUNK = 16
+N_JOBS = int(os.getenv("BACKTEST_N_JOBS", "-1"))
+SUMMARY_PATH = Path("reports/forecast_backtest_summary.csv")
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+def sarimax_panel(Y: np.ndarray, horizon: int) -> np.ndarray:
+    return np.vstack([forecast_series("", "", y, horizon=horizon)["mean"] for y in Y])
+
+# name -> (forecaster, vectorised over the whole panel?)
+FORECASTERS = {
+    **{name: (partial(forecast_mean, name), True) for name in BASELINES},
+    "sarimax": (sarimax_panel, False),
+}
+
+def origins(n_months: int, horizon: int = HORIZON, n_origins: int = N_ORIGINS, step: int = STEP) -> list[int]:
+    """Month indices where test windows start, oldest first; each leaves a full horizon."""
+    last = n_months - horizon
+    return sorted(o for o in (last - step * i for i in range(n_origins)) if o >= 2 * SEASON)
+
+def _run(model: str, Y: np.ndarray, origin: int, rows: slice, horizon: int) -> tuple:
+    fn, _ = FORECASTERS[model]
+    with np.errstate(all="ignore"):
+        return model, origin, rows, fn(Y[rows, :origin], horizon)
+
+def backtest_metrics(F: np.ndarray, A: np.ndarray, scale: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    F, A: (origin x horizon x series) forecasts and actuals; scale: (origin x series) MASE
+    denominators. Returns (horizon x series) metrics averaged over origins.
+    """
+    E = F - A
+    absE = np.abs(E)
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices (no history) stay NaN
+        ape = np.where(A != 0, absE / np.abs(A), np.nan)
+        sape = np.where(np.abs(A) + np.abs(F) > 0, 2 * absE / (np.abs(A) + np.abs(F)), np.nan)
+        scaled = absE / np.where(scale > 0, scale, np.nan)[:, None, :]
+        return {
+            "n_origins": np.sum(np.isfinite(E), axis=0),
+            "mae": np.nanmean(absE, axis=0),
+            "rmse": np.sqrt(np.nanmean(E ** 2, axis=0)),
+            "bias": np.nanmean(E, axis=0),
+            "mape": np.nanmean(ape, axis=0),
+            "smape": np.nanmean(sape, axis=0),
+            "mase": np.nanmean(scaled, axis=0),
+        }
+
+def run_backtest(series: pd.DataFrame, panels: dict[str, pd.DataFrame], models: list[str] = MODELS,
+                 horizon: int = HORIZON, n_jobs: int = N_JOBS) -> pd.DataFrame:
+    """Tidy metrics for every (model, target, series, horizon) over the rolling origins."""
+    n_series = len(series)
+    n_months = len(panels[TARGETS[0]])
+    origin_list = origins(n_months, horizon)
+    print(f"{n_series:,} series, {len(origin_list)} origins {origin_list}, horizons 1-{horizon}, models {models}")
+
+    frames = []
+    for target in TARGETS:
+        Y = panels[target].to_numpy(dtype=float).T            # series x months
+        tasks = []
+        for model in models:
+            chunks = [slice(0, n_series)] if FORECASTERS[model][1] else [
+                slice(i, i + SERIES_CHUNK) for i in range(0, n_series, SERIES_CHUNK)]
+            tasks += [(model, o, rows) for o in origin_list for rows in chunks]
+
+        timer = StageTimer(f"backtest:{target}")
+        F = {m: np.full((len(origin_list), horizon, n_series), np.nan) for m in models}
+        with parallel_config(backend="loky", inner_max_num_threads=1):
+            for model, o, rows, fc in Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+                    delayed(_run)(m, Y, o, rows, horizon) for m, o, rows in tasks):
+                F[model][origin_list.index(o), :, rows] = fc.T
+                timer.add(fc.shape[0])
+        timer.report()
+
+        # actuals and MASE scales for every origin at once
+        idx = np.asarray(origin_list)[:, None] + np.arange(horizon)[None, :]
+        A = Y[:, idx].transpose(1, 2, 0)                       # origin x horizon x series
+        seasonal_diff = np.abs(Y[:, SEASON:] - Y[:, :-SEASON])   # series x (months - SEASON)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            scale = np.vstack([np.nanmean(seasonal_diff[:, :o - SEASON], axis=1) for o in origin_list])
+
+        for model in models:
+            metrics = backtest_metrics(F[model], A, scale)
+            frames.append(pd.DataFrame({
+                "model": model,
+                "target": target,
+                "series_id": np.tile(series["series_id"].to_numpy(), horizon),
+                "level": np.tile(series["level"].to_numpy(), horizon),
+                "county": np.tile(series["county"].to_numpy(), horizon),
+                "district": np.tile(series["district"].to_numpy(), horizon),
+                "horizon": np.repeat(np.arange(1, horizon + 1), n_series),
+                **{k: v.ravel() for k, v in metrics.items()},
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+def summarize(metrics: pd.DataFrame) -> pd.DataFrame:
+    return (metrics.groupby(["target", "level", "model", "horizon"], as_index=False)
+                   [["mae", "rmse", "bias", "mape", "smape", "mase"]].mean())
+
+def main():
+    con = duckdb.connect(db_path())
+    series, panels = load_panel(con)
+    con.close()
+    keep = series["level"].isin(LEVELS).to_numpy()
+    series = series[keep].reset_index(drop=True)
+    panels = {t: p.loc[:, keep] for t, p in panels.items()}
+
+    metrics = run_backtest(series, panels)
+    summary = summarize(metrics)
+    Path("reports").mkdir(exist_ok=True)
+    summary.to_csv(SUMMARY_PATH, index=False)
+    print(summary.groupby(["target", "level", "model"])[["mae", "mape", "mase"]].mean().to_string())
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.register("df_bt", metrics)
+    con.execute("DROP TABLE IF EXISTS mart.forecast_backtest_metrics;")
+    con.execute("CREATE TABLE mart.forecast_backtest_metrics AS SELECT * FROM df_bt;")
+    con.close()
+    print(f"✓ Wrote mart.forecast_backtest_metrics ({len(metrics):,} rows), {SUMMARY_PATH}")
+
+if __name__ == "__main__":
+    main()
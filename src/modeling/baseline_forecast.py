@@ -0,0 +1,186 @@
+from __future__ import annotations
+import itertools
+import os
+import time
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.modeling.forecast_batch import (
+    load_panel, summing_matrix, reconcile, TARGETS, ADDITIVE_TARGETS, SEASON, Z_95,
+)
+
+load_dotenv()
+
+# Cheap benchmark forecasters, vectorised over a (series x months) panel (make baseline_forecast).
+#
+#   seasonal_naive   last observed season repeated
+#   drift            last value plus the average historical change per month
+#   ses              simple exponential smoothing
+#   holt_winters     additive level + trend + season
+# SES and Holt-Winters are fitted by grid search: every (series, parameter set) pair is one lane
+# of the same recursion over time, and each series keeps the parameter set with the lowest
+# one-step squared error. Each model returns (mean, sd) panels of shape (series x horizon);
+# sd uses the usual closed-form h-step variances for each method.
+#
+# Forecasts use the mart.forecasts layout (sales_volume reconciled like forecast_batch) and go
+# to mart.baseline_forecasts; backtest.py scores the same functions.
+
+HORIZON = 12
+SES_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+HW_GRID = np.array(list(itertools.product(
+    [0.05, 0.1, 0.2, 0.4, 0.7],     # alpha (level)
+    [0.01, 0.05, 0.15],             # beta (trend)
+    [0.05, 0.15, 0.3],              # gamma (season)
+)))
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+def _fill_leading(Y: np.ndarray) -> np.ndarray:
+    """Back-fill each row's leading NaNs with its first observed value (median price before first sale)."""
+    Y = np.asarray(Y, dtype=float)
+    first = np.argmax(~np.isnan(Y), axis=1)
+    head = Y[np.arange(len(Y)), first]
+    lead = np.arange(Y.shape[1])[None, :] < first[:, None]
+    return np.where(lead, head[:, None], Y)
+
+def seasonal_naive(Y: np.ndarray, horizon: int = HORIZON, season: int = SEASON) -> tuple[np.ndarray, np.ndarray]:
+    Y = _fill_leading(Y)
+    steps = np.arange(horizon)
+    mean = Y[:, Y.shape[1] - season + steps % season]
+    sigma = np.nanstd(Y[:, season:] - Y[:, :-season], axis=1)
+    return mean, sigma[:, None] * np.sqrt(steps // season + 1)[None, :]
+
+def drift(Y: np.ndarray, horizon: int = HORIZON) -> tuple[np.ndarray, np.ndarray]:
+    Y = _fill_leading(Y)
+    T = Y.shape[1]
+    h = np.arange(1, horizon + 1)
+    slope = (Y[:, -1] - Y[:, 0]) / (T - 1)
+    mean = Y[:, -1:] + slope[:, None] * h[None, :]
+    sigma = np.nanstd(np.diff(Y, axis=1) - slope[:, None], axis=1)
+    return mean, sigma[:, None] * np.sqrt(h * (1 + h / (T - 1)))[None, :]
+
+def _ses_lanes(Y: np.ndarray, alphas: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Final level and one-step SSE for every (alpha, series) lane: arrays of shape (G, N)."""
+    a = alphas[:, None]
+    level = np.broadcast_to(Y[:, 0], (len(alphas), len(Y))).copy()
+    sse = np.zeros_like(level)
+    for t in range(1, Y.shape[1]):
+        err = Y[:, t] - level
+        sse += err ** 2
+        level += a * err
+    return level, sse
+
+def ses(Y: np.ndarray, horizon: int = HORIZON) -> tuple[np.ndarray, np.ndarray]:
+    Y = _fill_leading(Y)
+    level, sse = _ses_lanes(Y, SES_ALPHAS)
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(len(Y))
+    alpha = SES_ALPHAS[best]
+    sigma = np.sqrt(sse[best, cols] / (Y.shape[1] - 1))
+    h = np.arange(1, horizon + 1)
+    mean = np.repeat(level[best, cols][:, None], horizon, axis=1)
+    return mean, sigma[:, None] * np.sqrt(1 + (h[None, :] - 1) * alpha[:, None] ** 2)
+
+def _hw_lanes(Y: np.ndarray, params: np.ndarray, season: int) -> tuple:
+    """Additive Holt-Winters over every (parameter set, series) lane; state arrays are (G, N[, m])."""
+    G, N = len(params), len(Y)
+    alpha, beta, gamma = (params[:, i, None] for i in range(3))
+    first, second = Y[:, :season].mean(axis=1), Y[:, season:2 * season].mean(axis=1)
+    level = np.broadcast_to(first, (G, N)).copy()
+    trend = np.broadcast_to((second - first) / season, (G, N)).copy()
+    seas = np.broadcast_to(Y[:, :season] - first[:, None], (G, N, season)).copy()
+    sse = np.zeros((G, N))
+    for t in range(season, Y.shape[1]):
+        j = t % season
+        s_prev = seas[:, :, j]
+        err = Y[:, t] - (level + trend + s_prev)
+        sse += err ** 2
+        new_level = level + trend + alpha * err
+        trend += beta * (new_level - level - trend)
+        seas[:, :, j] = s_prev + gamma * (Y[:, t] - new_level - s_prev)
+        level = new_level
+    return level, trend, seas, sse
+
+def holt_winters(Y: np.ndarray, horizon: int = HORIZON, season: int = SEASON) -> tuple[np.ndarray, np.ndarray]:
+    Y = _fill_leading(Y)
+    T = Y.shape[1]
+    if T < 2 * season:
+        return drift(Y, horizon)
+    level, trend, seas, sse = _hw_lanes(Y, HW_GRID, season)
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(len(Y))
+    h = np.arange(1, horizon + 1)
+    s_idx = (T + h - 1) % season
+    mean = (level[best, cols][:, None] + trend[best, cols][:, None] * h[None, :]
+            + seas[best, cols][:, s_idx])
+
+    # ETS(A,A,A) h-step variance (Hyndman et al. 2008, class 1)
+    alpha, beta, gamma = (HW_GRID[best, i][:, None] for i in range(3))
+    sigma2 = (sse[best, cols] / (T - season))[:, None]
+    k = ((h - 1) // season)[None, :]
+    hh = h[None, :]
+    var = sigma2 * (1 + (hh - 1) * (alpha ** 2 + alpha * beta * hh + beta ** 2 * hh * (2 * hh - 1) / 6)
+                    + k * (gamma * (2 * alpha + gamma) + beta * season * (k + 1)))
+    return mean, np.sqrt(var)
+
+BASELINES = {
+    "seasonal_naive": seasonal_naive,
+    "drift": drift,
+    "ses": ses,
+    "holt_winters": holt_winters,
+}
+
+def forecast_mean(name: str, Y: np.ndarray, horizon: int) -> np.ndarray:
+    """Point forecasts only; the backtest forecaster signature."""
+    return BASELINES[name](Y, horizon)[0]
+
+def main():
+    con = duckdb.connect(db_path())
+    series, panels = load_panel(con)
+    con.close()
+    months = panels[TARGETS[0]].index
+    future = pd.date_range(months[-1] + pd.offsets.MonthBegin(1), periods=HORIZON, freq="MS")
+    S = summing_matrix(series)
+    n = len(series)
+
+    parts, timings = [], []
+    for target in TARGETS:
+        Y = panels[target].to_numpy(dtype=float).T
+        for name, fn in BASELINES.items():
+            t0 = time.perf_counter()
+            with np.errstate(all="ignore"):
+                base, sd = fn(Y, HORIZON)
+            secs = time.perf_counter() - t0
+            timings.append({"target": target, "model": name, "series": n, "seconds": round(secs, 4)})
+            print(f"[{name}:{target}] {n:,} series x {Y.shape[1]} months in {secs * 1e3:.1f} ms")
+            rec = reconcile(np.nan_to_num(base), S) if target in ADDITIVE_TARGETS else base
+            parts.append(pd.DataFrame({
+                "level": np.repeat(series["level"].to_numpy(), HORIZON),
+                "county": np.repeat(series["county"].to_numpy(), HORIZON),
+                "district": np.repeat(series["district"].to_numpy(), HORIZON),
+                "target": target,
+                "month": np.tile(future.to_numpy(), n),
+                "model": name,
+                "base_forecast": base.ravel(),
+                "forecast": rec.ravel(),
+                "lower": (rec - Z_95 * sd).ravel(),
+                "upper": (rec + Z_95 * sd).ravel(),
+            }))
+    out = pd.concat(parts, ignore_index=True)
+    Path("reports").mkdir(exist_ok=True)
+    pd.DataFrame(timings).to_csv("reports/baseline_forecast_timings.csv", index=False)
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.register("df_base", out)
+    con.execute("DROP TABLE IF EXISTS mart.baseline_forecasts;")
+    con.execute("CREATE TABLE mart.baseline_forecasts AS SELECT * FROM df_base;")
+    con.close()
+    print(f"✓ Wrote mart.baseline_forecasts ({len(out):,} rows), reports/baseline_forecast_timings.csv")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import os
+import pickle
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from src.modeling.dataset import load_dataset, FEATURES, TARGET
+from src.modeling.train_price_model import ridge_pipeline, regression_metrics, RIDGE_ENCODERS
+from src.modeling.tune_price_model import rolling_origin_folds
+
+# Ridge location-encoder benchmark (make bench_encoders): every encoder in RIDGE_ENCODERS is
+# fitted on the same sample and scored on the most recent HORIZON_MONTHS (a time-based holdout,
+# not a random split). Peak memory is the tracemalloc high-water mark of a separate fit, which
+# numpy and scipy allocations report into.
+
+MAX_ROWS = int(os.getenv("BENCH_ENCODER_ROWS", "2000000"))
+HASH_WIDTHS = [64, 256, 1024]
+OUT_PATH = Path("reports/ridge_encoder_benchmark.csv")
+
+def bench_one(label: str, pipe, X_train, y_train, X_test, y_test) -> dict:
+    # memory on a separate fit: tracing allocations slows the fit down too much to time it
+    tracemalloc.start()
+    clone(pipe).fit(X_train, y_train)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    pipe.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pred = pipe.predict(X_test)
+    predict_s = time.perf_counter() - t0
+    return {
+        "encoder": label,
+        "n_columns": len(pipe.named_steps["pre"].get_feature_names_out()),
+        "fit_s": round(fit_s, 3),
+        "predict_s": round(predict_s, 3),
+        "fit_peak_mb": round(peak / 1e6, 1),
+        "model_kb": round(len(pickle.dumps(pipe)) / 1e3, 1),
+        **regression_metrics(y_test, pred, label=f"Ridge[{label}]"),
+    }
+
+def main():
+    df = load_dataset(columns=FEATURES + [TARGET], sample_rows=MAX_ROWS)
+    period = df["year"].to_numpy(dtype=np.int32) * 12 + df["month"].to_numpy(dtype=np.int32) - 1
+    train, test = rolling_origin_folds(period, n_folds=1)[0]
+    X, y = df[FEATURES], df[TARGET].to_numpy(dtype=float)
+    X_train, y_train, X_test, y_test = X.iloc[train], y[train], X.iloc[test], y[test]
+    print(f"Train {len(train):,} rows, test {len(test):,} rows (last 12 months)")
+
+    configs = []
+    for enc in RIDGE_ENCODERS:
+        if enc == "hashing":
+            configs += [(f"hashing({w})", ridge_pipeline(encoder=enc, hash_width=w)) for w in HASH_WIDTHS]
+        else:
+            configs.append((enc, ridge_pipeline(encoder=enc)))
+
+    out = pd.DataFrame([bench_one(label, pipe, X_train, y_train, X_test, y_test) for label, pipe in configs])
+    base = out.loc[out["encoder"] == "onehot"].iloc[0]
+    out["rmse_vs_onehot"] = out["rmse"] - base["rmse"]
+    out["fit_speedup_vs_onehot"] = base["fit_s"] / out["fit_s"]
+
+    OUT_PATH.parent.mkdir(exist_ok=True)
+    out.to_csv(OUT_PATH, index=False)
+    print(out.to_string(index=False))
+    print(f"✓ Saved encoder benchmark: {OUT_PATH}")
+
+if __name__ == "__main__":
+    main()
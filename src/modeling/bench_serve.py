@@ -0,0 +1,137 @@
+from __future__ import annotations
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.modeling.dataset import load_dataset, FEATURES
+from src.modeling.registry import load_model
+
+# Load test for serve_price (make bench_serve).
+#
+# For each MAX_BATCH setting a fresh server process is started, CONCURRENCY client threads
+# send single-listing requests over keep-alive connections for DURATION_S seconds, and we
+# record throughput, client-side p50/p99 latency and the batch sizes the server actually
+# formed. A direct in-process predict at the same batch sizes gives the ceiling to compare to.
+
+BATCH_SIZES = [1, 8, 32, 128, 512]
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "64"))
+DURATION_S = float(os.getenv("BENCH_DURATION_S", "10"))
+MODEL = os.getenv("BENCH_MODEL", "hgbr")
+OUT_PATH = Path("reports/serving_benchmark.csv")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _get(port: int, path: str) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+def _start_server(port: int, max_batch: int) -> subprocess.Popen:
+    env = {**os.environ, "PRICE_SERVER_PORT": str(port), "PRICE_SERVER_MAX_BATCH": str(max_batch)}
+    proc = subprocess.Popen([sys.executable, "-m", "src.modeling.serve_price"], env=env,
+                            stdout=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            _get(port, "/health")
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("Pricing server did not come up within 60s")
+
+def _client(port: int, bodies: list[bytes], stop: float, latencies: list) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    i = 0
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        conn.request("POST", "/predict", body=bodies[i % len(bodies)],
+                     headers={"Content-Type": "application/json"})
+        conn.getresponse().read()
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+
+def load_test(max_batch: int, bodies: list[bytes]) -> dict:
+    port = _free_port()
+    proc = _start_server(port, max_batch)
+    try:
+        per_thread = [[] for _ in range(CONCURRENCY)]
+        stop = time.perf_counter() + DURATION_S
+        threads = [threading.Thread(target=_client, args=(port, bodies[k::CONCURRENCY], stop, per_thread[k]))
+                   for k in range(CONCURRENCY)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        server = _get(port, "/metrics")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    lat = np.concatenate([np.asarray(x) for x in per_thread]) * 1000
+    return {
+        "mode": "server",
+        "max_batch": max_batch,
+        "concurrency": CONCURRENCY,
+        "requests": len(lat),
+        "throughput_rps": round(len(lat) / DURATION_S, 1),
+        "latency_ms_p50": round(float(np.percentile(lat, 50)), 2),
+        "latency_ms_p99": round(float(np.percentile(lat, 99)), 2),
+        "server_latency_ms_p50": server["latency_ms_p50"],
+        "server_latency_ms_p99": server["latency_ms_p99"],
+        "mean_batch_size": server["models"][MODEL]["mean_batch_size"],
+    }
+
+def direct_predict(model, X: pd.DataFrame, batch: int, repeats: int = 20) -> dict:
+    chunk = X.iloc[:batch]
+    model.predict(chunk)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(chunk)
+    secs = (time.perf_counter() - t0) / repeats
+    return {
+        "mode": "direct",
+        "max_batch": batch,
+        "throughput_rps": round(batch / secs, 1),
+        "latency_ms_p50": round(secs * 1000, 2),
+    }
+
+def main():
+    X = load_dataset(columns=FEATURES, sample_rows=max(BATCH_SIZES) * 4)
+    records = X.astype(object).to_dict(orient="records")
+    bodies = [json.dumps({"model": MODEL, "records": [r]}, default=str).encode("utf-8") for r in records]
+
+    model = load_model(MODEL)
+    rows = [direct_predict(model, X, b) for b in BATCH_SIZES]
+    for b in BATCH_SIZES:
+        rows.append(load_test(b, bodies))
+        r = rows[-1]
+        print(f"max_batch={b:>4}: {r['throughput_rps']:>9,.0f} req/s  p50={r['latency_ms_p50']}ms "
+              f"p99={r['latency_ms_p99']}ms  mean batch={r['mean_batch_size']}")
+
+    out = pd.DataFrame(rows, columns=[
+        "mode", "max_batch", "concurrency", "requests", "throughput_rps", "latency_ms_p50",
+        "latency_ms_p99", "server_latency_ms_p50", "server_latency_ms_p99", "mean_batch_size",
+    ])
+    OUT_PATH.parent.mkdir(exist_ok=True)
+    out.to_csv(OUT_PATH, index=False)
+    print(out.to_string(index=False))
+    print(f"✓ Saved serving benchmark: {OUT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+# Additive booster used by train_incremental's warm-start HGBR updates. Kept out of the
+# training script so registered models unpickle as src.modeling.boosting.AdditiveBoostedRegressor
+# (a class defined in a `python -m` script would be pickled as __main__.AdditiveBoostedRegressor).
+
+class AdditiveBoostedRegressor(BaseEstimator, RegressorMixin):
+    """
+    A booster plus correction boosters fitted on the residuals left by the ones before;
+    predictions add up. fit() fits `base` (default HGBR) and then each of `updates` in turn;
+    train_incremental builds one from already fitted boosters with from_fitted().
+    """
+
+    def __init__(self, base=None, updates=None):
+        self.base = base
+        self.updates = updates
+
+    @classmethod
+    def from_fitted(cls, base, updates) -> "AdditiveBoostedRegressor":
+        model = cls(base, list(updates))
+        model.base_, model.updates_ = base, list(updates)
+        return model
+
+    def __sklearn_is_fitted__(self) -> bool:
+        return hasattr(self, "base_")
+
+    def fit(self, X, y, sample_weight=None):
+        y = np.asarray(y, dtype=float)
+        base = clone(self.base) if self.base is not None else HistGradientBoostingRegressor(random_state=42)
+        self.base_ = base.fit(X, y, sample_weight=sample_weight)
+        residual = y - self.base_.predict(X)
+        self.updates_ = []
+        for u in self.updates or []:
+            u = clone(u).fit(X, residual, sample_weight=sample_weight)
+            residual = residual - u.predict(X)
+            self.updates_.append(u)
+        return self
+
+    def predict(self, X):
+        pred = self.base_.predict(X)
+        for u in self.updates_:
+            pred = pred + u.predict(X)
+        return pred
+
+    @property
+    def n_iter_(self) -> int:
+        return self.base_.n_iter_ + sum(u.n_iter_ for u in self.updates_)
@@ -2,33 +2,50 @@ from __future__ import annotations
 import os
 from pathlib import Path
 import duckdb
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
+from src.modeling.profiling import StageTimer
+
 load_dotenv()
 
+ROW_GROUP_ROWS = 1_000_000
+
+# Stored as dictionary-encoded columns (read back by pandas as categoricals)
+CAT_COLS = ["property_type", "duration", "district", "county"]
+
 def db_path() -> str:
     return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
 
+def dictionary_encode(batch: pa.RecordBatch) -> pa.RecordBatch:
+    cols = []
+    for name, col in zip(batch.schema.names, batch.columns):
+        cols.append(col.dictionary_encode() if name in CAT_COLS else col)
+    return pa.RecordBatch.from_arrays(cols, names=batch.schema.names)
+
 def main():
     out_path = Path("data/processed/model_dataset.parquet")
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".parquet.tmp")
 
+    timer = StageTimer("build_model")
     con = duckdb.connect(db_path())
 
-    # Keep only “usable” rows for modeling
-    df = con.execute("""
+    # Keep only “usable” rows for modeling; downcast in SQL so Python never sees wide types.
+    # Sorted by time so Parquet row-group statistics allow year/month pushdown downstream.
+    reader = con.execute("""
         SELECT
           price,
-          LOG(price) AS log_price,
+          LOG(price)::FLOAT          AS log_price,
           date_of_transfer,
-          year,
-          month,
-          quarter,
+          year::SMALLINT             AS year,
+          month::TINYINT             AS month,
+          quarter::TINYINT           AS quarter,
           property_type,
-          is_new_build,
+          is_new_build::TINYINT      AS is_new_build,
           duration,
-          is_freehold,
+          is_freehold::TINYINT       AS is_freehold,
           district,
           county
         FROM stg.ppd_clean_valid
@@ -36,18 +53,30 @@ def main():
           AND year IS NOT NULL
           AND district IS NOT NULL AND district <> ''
           AND county IS NOT NULL AND county <> ''
-          AND property_type IN ('F','S','D','T','O');
-    """).fetchdf()
+          AND property_type IN ('F','S','D','T','O')
+        ORDER BY year, month;
+    """).fetch_record_batch(ROW_GROUP_ROWS)
 
-    con.close()
+    # Stream record batches straight into Parquet, one row group per batch
+    writer = None
+    try:
+        for batch in reader:
+            batch = dictionary_encode(batch)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, batch.schema, compression="zstd")
+            writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+            timer.add(batch.num_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+        con.close()
 
-    # Basic type casting
-    cat_cols = ["property_type", "duration", "district", "county"]
-    for c in cat_cols:
-        df[c] = df[c].astype("category")
+    if writer is None:
+        raise SystemExit("No modeling rows found in stg.ppd_clean_valid. Run `make clean` first.")
 
-    df.to_parquet(out_path, index=False)
-    print(f"✓ Saved modeling dataset: {out_path} with {len(df):,} rows")
+    os.replace(tmp_path, out_path)
+    timer.report()
+    print(f"✓ Saved modeling dataset: {out_path} with {timer.rows:,} rows")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,63 +1,105 @@
 from __future__ import annotations
+import os
+from pathlib import Path
+import duckdb
 import pandas as pd
 import numpy as np
-from pathlib import Path
+from dotenv import load_dotenv
 
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
-def main():
-    df = pd.read_parquet("data/processed/model_dataset.parquet")
+from src.modeling.dataset import (
+    load_dataset, iter_batches, iter_shuffled_batches, distinct_values, DATASET_PATH,
+)
+from src.modeling.k_selection import select_k
+from src.modeling.profiling import StageTimer, matrix_mb, peak_rss_mb
 
-    # Use a sample if dataset is huge (keeps it fast). Increase later.
-    if len(df) > 500000:
-        df = df.sample(500000, random_state=42).copy()
-
-    X = df[[
-        "log_price",
-        "property_type",
-        "is_new_build",
-        "duration",
-        "is_freehold",
-        "county"
-    ]].copy()
-
-    num_features = ["log_price", "is_new_build", "is_freehold"]
-    cat_features = ["property_type", "duration", "county"]
-
-    pre = ColumnTransformer(
+load_dotenv()
+
+# Transaction segmentation (make cluster).
+#
+#   CLUSTER_MODE=sample  (default) KMeans on a 500k-row reservoir sample
+#   CLUSTER_MODE=stream  MiniBatchKMeans over the whole dataset: one pass of partial_fit over
+#                        shuffled row groups, then a second pass in file order that labels
+#                        every transaction into mart.transaction_segments (row_id = file row)
+
+CLUSTER_MODE = os.getenv("CLUSTER_MODE", "sample")
+SAMPLE_ROWS = int(os.getenv("CLUSTER_SAMPLE_ROWS", "500000")) or None   # 0 = every row
+MINIBATCH_ROWS = 16_384
+STREAM_EPOCHS = 1
+LABEL_BATCH_ROWS = 1_000_000
+BATCH_LOG = Path("reports/cluster_stream_batches.csv")
+K_CANDIDATES = [4, 5, 6, 7, 8, 10]
+
+NUM_FEATURES = ["log_price", "is_new_build", "is_freehold"]
+CAT_FEATURES = ["property_type", "duration", "county"]
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+def to_float32(X):
+    return X.astype(np.float32)
+
+def make_preprocessor(categories: dict[str, list] | None = None) -> Pipeline:
+    """
+    Sparse float32 CSR features: 3 scaled numeric columns plus one-hot property_type, duration
+    and county (~120 columns, ~6 non-zeros per row). KMeans/MiniBatchKMeans fit CSR float32
+    directly, so nothing downstream densifies or upcasts.
+    """
+    # fixed categories keep the encoded layout identical across streamed batches
+    cats = [categories[c] for c in CAT_FEATURES] if categories else "auto"
+    cols = ColumnTransformer(
         transformers=[
-            ("num", Pipeline([("scaler", StandardScaler())]), num_features),
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_features),
+            ("num", Pipeline([("scaler", StandardScaler())]), NUM_FEATURES),
+            ("cat", OneHotEncoder(categories=cats, handle_unknown="ignore", sparse_output=True,
+                                  dtype=np.float32), CAT_FEATURES),
         ],
-        remainder="drop"
+        remainder="drop",
+        sparse_threshold=1.0,
     )
+    return Pipeline([
+        ("cols", cols),
+        ("f32", FunctionTransformer(to_float32, accept_sparse=True, feature_names_out="one-to-one")),
+    ])
 
-    # Choose K using silhouette on a small subset
-    X_small = X.sample(min(50000, len(X)), random_state=42)
-    X_small_enc = pre.fit_transform(X_small)
+def report_matrix(label: str, X) -> None:
+    dense64 = X.shape[0] * X.shape[1] * 8 / 1e6
+    print(f"[{label}] {X.shape[0]:,} x {X.shape[1]} {type(X).__name__} {X.dtype}: "
+          f"{matrix_mb(X):,.1f} MB (dense float64 would be {dense64:,.1f} MB), peak RSS {peak_rss_mb():,.0f} MB")
 
-    best_k, best_score = None, -1
-    for k in [4, 5, 6, 7, 8, 10]:
-        km = KMeans(n_clusters=k, random_state=42, n_init=10)
-        labels = km.fit_predict(X_small_enc)
-        score = silhouette_score(X_small_enc, labels)
-        print(f"k={k} silhouette={score:.4f}")
-        if score > best_score:
-            best_k, best_score = k, score
+def choose_k(X_small_enc) -> int:
+    best_k, _ = select_k(X_small_enc, K_CANDIDATES, name="transactions")
+    return best_k
+
+def main_sample():
+    # Use a sample if dataset is huge (keeps it fast). Increase later.
+    # Sampled inside the Parquet scan, reading only the columns used below.
+    df = load_dataset(
+        columns=["date_of_transfer", "price", "log_price", "property_type", "is_new_build",
+                 "duration", "is_freehold", "district", "county"],
+        sample_rows=SAMPLE_ROWS,
+    )
 
-    print(f"\n✓ Best k={best_k} (silhouette={best_score:.4f})")
+    X = df[NUM_FEATURES + CAT_FEATURES]
+    pre = make_preprocessor()
+
+    # Choose K on a subset (parallel, sampled silhouette + cheap criteria; see k_selection)
+    X_small = X.sample(min(50000, len(X)), random_state=42)
+    best_k = choose_k(pre.fit_transform(X_small))
 
     # Fit final model on full sample
     X_enc = pre.fit_transform(X)
+    report_matrix("cluster:features", X_enc)
     km_final = KMeans(n_clusters=best_k, random_state=42, n_init=10)
     clusters = km_final.fit_predict(X_enc)
+    del X_enc
 
-    out = df.copy()
-    out["segment_id"] = clusters
+    # label in place: df already holds compact dtypes (categoricals, small ints)
+    out = df
+    out["segment_id"] = clusters.astype(np.int16)
 
     Path("reports").mkdir(exist_ok=True)
 
@@ -76,6 +118,7 @@ def main():
     prof.to_csv("reports/segment_profiles.csv")
     print("\nSaved: reports/segment_profiles.csv")
     print(prof.head(20))
+    print(f"[cluster] peak RSS {peak_rss_mb():,.0f} MB")
 
     # Save a small labeled sample for dashboard inspection
     sample_out = out.sample(min(20000, len(out)), random_state=42)
@@ -85,5 +128,97 @@ def main():
     ]].to_parquet("data/processed/transaction_segment_sample.parquet", index=False)
     print("Saved: data/processed/transaction_segment_sample.parquet")
 
+def main_stream():
+    cols = NUM_FEATURES + CAT_FEATURES
+    pre = make_preprocessor(distinct_values(CAT_FEATURES))
+    # scaler statistics from a sample; the centroids come from the full stream
+    X_small = load_dataset(columns=cols, sample_rows=50000)
+    X_small_enc = pre.fit_transform(X_small)
+    report_matrix("cluster_stream:features", X_small_enc)
+    best_k = choose_k(X_small_enc)
+
+    km = MiniBatchKMeans(n_clusters=best_k, batch_size=MINIBATCH_ROWS, random_state=42, n_init=3)
+    km.partial_fit(X_small_enc)  # k-means++ seeding on the sample
+    batch_log = []
+    fit_timer = StageTimer("cluster_stream:fit")
+    for epoch in range(STREAM_EPOCHS):
+        for df in iter_shuffled_batches(columns=cols, seed=42 + epoch):
+            t0 = fit_timer.seconds
+            X_enc = pre.transform(df)
+            for i in range(0, X_enc.shape[0], MINIBATCH_ROWS):
+                km.partial_fit(X_enc[i:i + MINIBATCH_ROWS])
+            secs = fit_timer.seconds - t0
+            fit_timer.add(len(df))
+            batch_log.append({"pass": f"fit{epoch}", "rows": len(df), "seconds": round(secs, 3),
+                              "rows_per_sec": round(len(df) / secs, 1)})
+            print(f"[fit{epoch}] {len(df):,} rows in {secs:.2f}s ({len(df) / secs:,.0f} rows/s)")
+    fit_timer.report()
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.execute("""
+        CREATE OR REPLACE TABLE mart.transaction_segments (
+          row_id BIGINT, county VARCHAR, property_type VARCHAR, segment_id SMALLINT
+        );
+    """)
+    label_timer = StageTimer("cluster_stream:label")
+    offset = 0
+    try:
+        for df in iter_batches(columns=cols, batch_rows=LABEL_BATCH_ROWS):
+            t0 = label_timer.seconds
+            out = pd.DataFrame({
+                "row_id": np.arange(offset, offset + len(df), dtype=np.int64),
+                "county": df["county"].astype(str),
+                "property_type": df["property_type"].astype(str),
+                "segment_id": km.predict(pre.transform(df)).astype(np.int16),
+            })
+            con.register("_chunk", out)
+            con.execute("INSERT INTO mart.transaction_segments SELECT * FROM _chunk")
+            con.unregister("_chunk")
+            offset += len(df)
+            secs = label_timer.seconds - t0
+            label_timer.add(len(df))
+            batch_log.append({"pass": "label", "rows": len(df), "seconds": round(secs, 3),
+                              "rows_per_sec": round(len(df) / secs, 1)})
+            print(f"[label] {len(df):,} rows in {secs:.2f}s ({len(df) / secs:,.0f} rows/s)")
+        label_timer.report()
+
+        # profiles and the dashboard sample join labels back to the dataset on the file row
+        src = f"read_parquet('{DATASET_PATH.as_posix()}', file_row_number=true)"
+        prof = con.execute(f"""
+            SELECT s.segment_id,
+                   COUNT(*) AS n,
+                   MEDIAN(d.price) AS median_price,
+                   AVG(d.price) AS mean_price,
+                   AVG(d.is_new_build) AS new_build_rate,
+                   AVG(d.is_freehold) AS freehold_rate
+            FROM mart.transaction_segments s
+            JOIN {src} d ON d.file_row_number = s.row_id
+            GROUP BY 1
+            ORDER BY n DESC
+        """).fetchdf().set_index("segment_id")
+        sample_out = con.execute(f"""
+            SELECT d.date_of_transfer, d.price, d.property_type, d.is_new_build, d.duration,
+                   d.district, d.county, s.segment_id
+            FROM (SELECT * FROM mart.transaction_segments USING SAMPLE reservoir(20000 ROWS) REPEATABLE (42)) s
+            JOIN {src} d ON d.file_row_number = s.row_id
+        """).fetchdf()
+    finally:
+        con.close()
+
+    Path("reports").mkdir(exist_ok=True)
+    pd.DataFrame(batch_log).to_csv(BATCH_LOG, index=False)
+    prof.to_csv("reports/segment_profiles.csv")
+    sample_out.to_parquet("data/processed/transaction_segment_sample.parquet", index=False)
+    print(prof.head(20))
+    print(f"Saved: mart.transaction_segments ({offset:,} rows), reports/segment_profiles.csv, {BATCH_LOG}")
+    print("Saved: data/processed/transaction_segment_sample.parquet")
+
+def main():
+    if CLUSTER_MODE == "stream":
+        main_stream()
+    else:
+        main_sample()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,20 +1,123 @@
 from __future__ import annotations
+import json
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 import duckdb
+import joblib
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
 
+from scipy.optimize import linear_sum_assignment
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+
+from src.modeling.k_selection import select_k
 
 load_dotenv()
 
+# District segmentation with stable ids across monthly refreshes (make cluster_district).
+#
+# The fitted scaler, KMeans and an id map (KMeans cluster index -> published segment id) are
+# kept in models/district_segments/. Each run rebuilds mart.district_features and compares it
+# with the reference captured at fit time:
+#   - no state yet, FORCE_REFIT=1, or drift above threshold -> full refit; the new centroids
+#     are matched to the previous ones (Hungarian assignment, in the new scaled space) so a
+#     segment keeps its id when it is still recognisably the same group
+#   - otherwise -> only new districts and districts whose features changed are assigned with
+#     predict(); everyone else keeps their segment
+# Drift: max over features of |mean shift| in reference standard deviations, and the ratio of
+# current to reference mean squared distance to the nearest centroid.
+
+STATE_DIR = Path("models/district_segments")
+MEAN_SHIFT_MAX = float(os.getenv("SEGMENT_MEAN_SHIFT_MAX", "0.25"))
+INERTIA_RATIO_MAX = float(os.getenv("SEGMENT_INERTIA_RATIO_MAX", "1.25"))
+FORCE_REFIT = os.getenv("FORCE_REFIT", "0") == "1"
+K_CANDIDATES = [3, 4, 5, 6, 7, 8]
+ID_COLS = ["county", "district"]
+
 def db_path() -> str:
     return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
 
+def load_state() -> dict | None:
+    if not (STATE_DIR / "state.json").exists():
+        return None
+    state = json.loads((STATE_DIR / "state.json").read_text(encoding="utf-8"))
+    state["scaler"] = joblib.load(STATE_DIR / "scaler.joblib")
+    state["kmeans"] = joblib.load(STATE_DIR / "kmeans.joblib")
+    return state
+
+def save_state(scaler: StandardScaler, km: KMeans, id_map: np.ndarray, X: pd.DataFrame) -> dict:
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    joblib.dump(scaler, STATE_DIR / "scaler.joblib")
+    joblib.dump(km, STATE_DIR / "kmeans.joblib")
+    state = {
+        "fitted_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "k": int(km.n_clusters),
+        "id_map": [int(i) for i in id_map],
+        "feature_columns": list(X.columns),
+        "reference_mean": X.mean().tolist(),
+        "reference_std": X.std(ddof=0).replace(0, 1).tolist(),
+        "reference_inertia": float(km.inertia_ / len(X)),
+    }
+    tmp = STATE_DIR / "state.json.tmp"
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, STATE_DIR / "state.json")
+    return {**state, "scaler": scaler, "kmeans": km}
+
+def drift(state: dict, X: pd.DataFrame) -> dict:
+    mean_shift = np.abs(X.mean().to_numpy() - np.asarray(state["reference_mean"])) / np.asarray(state["reference_std"])
+    km = state["kmeans"]
+    Xs = state["scaler"].transform(X)
+    inertia = float((km.transform(Xs).min(axis=1) ** 2).mean())
+    return {
+        "max_mean_shift": float(mean_shift.max()),
+        "shifted_feature": X.columns[int(mean_shift.argmax())],
+        "inertia_ratio": inertia / state["reference_inertia"] if state["reference_inertia"] else 1.0,
+    }
+
+def match_ids(prev: dict, scaler: StandardScaler, km: KMeans) -> np.ndarray:
+    """id_map for a refit: new cluster -> previous id with the nearest centroid (Hungarian)."""
+    old_raw = prev["scaler"].inverse_transform(prev["kmeans"].cluster_centers_)
+    old_centers = scaler.transform(pd.DataFrame(old_raw, columns=prev["feature_columns"]))
+    cost = np.linalg.norm(km.cluster_centers_[:, None, :] - old_centers[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    old_ids = np.asarray(prev["id_map"])
+    id_map = np.full(km.n_clusters, -1)
+    id_map[rows] = old_ids[cols]
+    # k grew: unmatched clusters get fresh ids
+    next_id = int(old_ids.max()) + 1
+    for i in np.flatnonzero(id_map < 0):
+        id_map[i] = next_id
+        next_id += 1
+    return id_map
+
+def full_fit(X: pd.DataFrame, prev: dict | None) -> dict:
+    scaler = StandardScaler()
+    Xs = scaler.fit_transform(X)
+    best_k, _ = select_k(Xs, K_CANDIDATES, name="districts", n_init=20)
+    km = KMeans(n_clusters=best_k, random_state=42, n_init=20).fit(Xs)
+    id_map = match_ids(prev, scaler, km) if prev is not None else np.arange(best_k)
+    return save_state(scaler, km, id_map, X)
+
+def assign(state: dict, X: pd.DataFrame) -> np.ndarray:
+    clusters = state["kmeans"].predict(state["scaler"].transform(X[state["feature_columns"]]))
+    return np.asarray(state["id_map"])[clusters]
+
+def changed_rows(df: pd.DataFrame, previous: pd.DataFrame | None, feature_cols: list[str]) -> np.ndarray:
+    """Mask of districts that are new or whose features differ from the published table."""
+    if previous is None or previous.empty:
+        return np.ones(len(df), dtype=bool)
+    merged = df[ID_COLS + feature_cols].merge(previous, on=ID_COLS, how="left", suffixes=("", "_prev"))
+    new = merged["district_segment"].isna().to_numpy()
+    diff = np.zeros(len(df), dtype=bool)
+    for c in feature_cols:
+        a = merged[c].to_numpy(dtype=float)
+        b = merged[f"{c}_prev"].to_numpy(dtype=float)
+        diff |= ~np.isclose(a, b, rtol=1e-9, equal_nan=True)
+    return new | diff
+
 def main():
     con = duckdb.connect(db_path())
 
@@ -22,30 +125,46 @@ def main():
     con.execute(Path("sql/ddl/007_district_features_duckdb.sql").read_text(encoding="utf-8"))
 
     df = con.execute("SELECT * FROM mart.district_features;").fetchdf()
+    has_previous = con.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = 'mart' AND table_name = 'district_segments'
+    """).fetchone()[0] > 0
+    previous = con.execute("SELECT * FROM mart.district_segments;").fetchdf() if has_previous else None
     con.close()
 
     # Features for clustering (exclude identifiers)
-    id_cols = ["county", "district"]
-    X = df.drop(columns=id_cols).copy()
-
-    # Scale
-    scaler = StandardScaler()
-    Xs = scaler.fit_transform(X)
-
-    # Select K
-    best_k, best_score = None, -1
-    for k in [3, 4, 5, 6, 7, 8]:
-        km = KMeans(n_clusters=k, random_state=42, n_init=20)
-        labels = km.fit_predict(Xs)
-        score = silhouette_score(Xs, labels)
-        print(f"k={k} silhouette={score:.4f}")
-        if score > best_score:
-            best_k, best_score = k, score
+    X = df.drop(columns=ID_COLS).copy()
 
-    print(f"\n✓ Best district k={best_k} (silhouette={best_score:.4f})")
+    state = load_state()
+    if state is not None and state["feature_columns"] != list(X.columns):
+        # ids cannot be carried over when the feature space itself changed
+        print("Feature columns changed since the last fit; refitting with fresh ids")
+        state = None
+    metrics = drift(state, X) if state is not None else {}
+    refit = state is None or FORCE_REFIT or (
+        metrics["max_mean_shift"] > MEAN_SHIFT_MAX or metrics["inertia_ratio"] > INERTIA_RATIO_MAX
+    )
 
-    km_final = KMeans(n_clusters=best_k, random_state=42, n_init=20)
-    df["district_segment"] = km_final.fit_predict(Xs)
+    if refit:
+        action = "initial_fit" if state is None else "refit"
+        print(f"{action}: {metrics or 'no saved segmentation'}")
+        state = full_fit(X, state)
+        df["district_segment"] = assign(state, X)
+        n_assigned = len(df)
+    else:
+        action = "incremental"
+        print(f"incremental (drift {metrics} within thresholds)")
+        prev_cols = ID_COLS + state["feature_columns"] + ["district_segment"]
+        mask = changed_rows(df, previous[prev_cols] if previous is not None else None, state["feature_columns"])
+        segment = np.empty(len(df), dtype=np.int64)
+        if previous is not None:
+            keep = df[ID_COLS].merge(previous[ID_COLS + ["district_segment"]], on=ID_COLS, how="left")
+            segment[~mask] = keep.loc[~mask, "district_segment"].to_numpy(dtype=np.int64)
+        if mask.any():
+            segment[mask] = assign(state, X[mask])
+        df["district_segment"] = segment
+        n_assigned = int(mask.sum())
+    print(f"✓ {action}: assigned {n_assigned:,} of {len(df):,} districts (k={state['k']})")
 
     Path("reports").mkdir(exist_ok=True)
     df.to_csv("reports/district_segments.csv", index=False)
@@ -68,13 +187,30 @@ def main():
     print(prof)
 
     # (Optional) write back to DuckDB for dashboard
+    run = pd.DataFrame([{
+        "run_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        "action": action,
+        "k": state["k"],
+        "n_districts": len(df),
+        "n_assigned": n_assigned,
+        "max_mean_shift": metrics.get("max_mean_shift"),
+        "inertia_ratio": metrics.get("inertia_ratio"),
+    }])
     con = duckdb.connect(db_path())
     con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
     con.register("df_seg", df)
     con.execute("DROP TABLE IF EXISTS mart.district_segments;")
     con.execute("CREATE TABLE mart.district_segments AS SELECT * FROM df_seg;")
+    con.register("df_run", run)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS mart.district_segment_runs (
+          run_at TIMESTAMP, action VARCHAR, k INTEGER, n_districts INTEGER, n_assigned INTEGER,
+          max_mean_shift DOUBLE, inertia_ratio DOUBLE
+        );
+    """)
+    con.execute("INSERT INTO mart.district_segment_runs SELECT * FROM df_run;")
     con.close()
     print("✓ Wrote mart.district_segments into DuckDB")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
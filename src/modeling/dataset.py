@@ -0,0 +1,232 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Shared access to data/processed/model_dataset.parquet for the modeling scripts.
+# Queries go through DuckDB so only the requested columns are decoded, year/county filters
+# are checked against Parquet row-group statistics (the file is written sorted by year/month),
+# and sampling happens inside the scan instead of after a full pandas load.
+
+DATASET_PATH = Path("data/processed/model_dataset.parquet")
+
+TARGET = "log_price"
+NUM_FEATURES = ["year", "month", "quarter", "is_new_build", "is_freehold"]
+CAT_FEATURES = ["property_type", "duration", "district", "county"]
+FEATURES = ["year", "month", "quarter",
+            "property_type", "is_new_build", "duration", "is_freehold",
+            "district", "county"]
+
+def price_from_log(log_price):
+    """Invert the target: build_model writes DuckDB LOG(price), which is base 10."""
+    return np.power(10.0, log_price)
+
+def _where(years: tuple[int, int] | None, counties: list[str] | None,
+           since: tuple[int, int] | None = None) -> tuple[str, list]:
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("(year > ? OR (year = ? AND month > ?))")
+        params += [int(since[0]), int(since[0]), int(since[1])]
+    if years is not None:
+        clauses.append("year BETWEEN ? AND ?")
+        params += [int(years[0]), int(years[1])]
+    if counties:
+        clauses.append(f"county IN ({', '.join('?' for _ in counties)})")
+        params += list(counties)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    # DuckDB hands strings back as plain VARCHAR; restore the categorical dtypes
+    for name in CAT_FEATURES:
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table.column(name).dictionary_encode())
+    return table.to_pandas()
+
+def load_dataset(
+    columns: list[str] | None = None,
+    years: tuple[int, int] | None = None,
+    counties: list[str] | None = None,
+    since: tuple[int, int] | None = None,
+    sample_rows: int | None = None,
+    sample_frac: float | None = None,
+    seed: int = 42,
+    path: Path = DATASET_PATH,
+) -> pd.DataFrame:
+    """
+    Read the modeling dataset with projection, filter and sampling pushed into the scan.
+
+    since=(year, month): only months after it.
+    sample_rows: reservoir sample of exactly n rows (after filters); memory stays O(n).
+    sample_frac: block-level TABLESAMPLE (0-1); skips whole vectors, cheapest for rough samples.
+    """
+    cols = ", ".join(columns) if columns else "*"
+    where, params = _where(years, counties, since)
+    source = f"read_parquet('{Path(path).as_posix()}')"
+    if sample_frac is not None:
+        source += f" TABLESAMPLE SYSTEM({float(sample_frac) * 100}%) REPEATABLE ({int(seed)})"
+    sql = f"SELECT {cols} FROM {source} {where}"
+    if sample_rows is not None:
+        sql = f"SELECT * FROM ({sql}) USING SAMPLE reservoir({int(sample_rows)} ROWS) REPEATABLE ({int(seed)})"
+
+    con = duckdb.connect()
+    try:
+        table = con.execute(sql, params).fetch_arrow_table()
+    finally:
+        con.close()
+    return _to_pandas(table)
+
+def iter_batches(columns: list[str] | None = None, batch_rows: int = 1_000_000,
+                 since: tuple[int, int] | None = None,
+                 path: Path = DATASET_PATH) -> Iterator[pd.DataFrame]:
+    """
+    Stream the dataset one bounded DataFrame at a time.
+    Without `since` rows come in file order; with since=(year, month) only later months are
+    read, skipping row groups whose statistics rule them out.
+    """
+    if since is None:
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    year, month = since
+    flt = (pc.field("year") > year) | ((pc.field("year") == year) & (pc.field("month") > month))
+    for batch in ds.dataset(path, format="parquet").to_batches(
+        columns=columns, filter=flt, batch_size=batch_rows
+    ):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def iter_shuffled_batches(columns: list[str] | None = None, seed: int = 42,
+                          since: tuple[int, int] | None = None, batch_rows: int | None = None,
+                          row_numbers: bool = False,
+                          path: Path = DATASET_PATH) -> Iterator[pd.DataFrame]:
+    """
+    One Parquet row group at a time, in random row-group order with rows shuffled inside each
+    group. The file is sorted by time, so streaming learners (mini-batch k-means, SGD) see a
+    mix of years rather than a drift from 1995 to today.
+    since=(year, month) keeps later months only (row groups are skipped on their year
+    statistics); batch_rows splits each shuffled group into smaller frames; row_numbers adds
+    `file_row_number`, the row's position in the file, for holdout masks (see is_holdout).
+    """
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    starts = np.cumsum([0] + [meta.row_group(i).num_rows for i in range(meta.num_row_groups)])
+    read_cols = columns
+    if since is not None and columns is not None:
+        read_cols = list(dict.fromkeys(columns + ["year", "month"]))
+    year_idx = pf.schema_arrow.get_field_index("year")
+    rng = np.random.default_rng(seed)
+    for i in rng.permutation(meta.num_row_groups):
+        i = int(i)
+        if since is not None and year_idx >= 0:
+            stats = meta.row_group(i).column(year_idx).statistics
+            if stats is not None and stats.has_min_max and stats.max < since[0]:
+                continue
+        df = pf.read_row_group(i, columns=read_cols).to_pandas()
+        if row_numbers:
+            df["file_row_number"] = np.arange(starts[i], starts[i + 1])
+        if since is not None:
+            year, month = since
+            df = df[(df["year"] > year) | ((df["year"] == year) & (df["month"] > month))]
+            if columns is not None:
+                df = df[columns + (["file_row_number"] if row_numbers else [])]
+        if not len(df):
+            continue
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+        step = batch_rows or len(df)
+        for lo in range(0, len(df), step):
+            yield df.iloc[lo:lo + step]
+
+def take_rows(columns: list[str], rows: np.ndarray, path: Path = DATASET_PATH) -> pd.DataFrame:
+    """Rows at the given file positions (e.g. a sample drawn from the feature store), in that order."""
+    pos = pd.DataFrame({"file_row_number": np.asarray(rows, dtype=np.int64), "_order": np.arange(len(rows))})
+    con = duckdb.connect()
+    try:
+        con.register("_rows", pos)
+        table = con.execute(f"""
+            SELECT {", ".join(f"t.{c}" for c in columns)}
+            FROM read_parquet('{Path(path).as_posix()}', file_row_number=true) t
+            JOIN _rows r USING (file_row_number)
+            ORDER BY r._order
+        """).fetch_arrow_table()
+    finally:
+        con.close()
+    return _to_pandas(table)
+
+def distinct_values(columns: list[str], path: Path = DATASET_PATH) -> dict[str, list]:
+    """Sorted distinct values per column, e.g. to fix encoder categories before streaming."""
+    con = duckdb.connect()
+    try:
+        return {
+            c: [v[0] for v in con.execute(
+                f"SELECT DISTINCT {c} FROM read_parquet('{Path(path).as_posix()}') "
+                f"WHERE {c} IS NOT NULL ORDER BY 1"
+            ).fetchall()]
+            for c in columns
+        }
+    finally:
+        con.close()
+
+def latest_month(path: Path = DATASET_PATH) -> tuple[int, int]:
+    con = duckdb.connect()
+    try:
+        return tuple(con.execute(
+            f"SELECT year, month FROM read_parquet('{Path(path).as_posix()}') "
+            "ORDER BY year DESC, month DESC LIMIT 1"
+        ).fetchone())
+    finally:
+        con.close()
+
+def stratified_sample(
+    columns: list[str],
+    strata: list[str],
+    max_rows: int,
+    holdout_every: int | None = None,
+    seed: float = 0.42,
+    path: Path = DATASET_PATH,
+) -> pd.DataFrame:
+    """
+    Bounded sample with an equal row cap per stratum (e.g. county x year), so small strata
+    are kept whole instead of being crowded out. Adds `sample_weight` = stratum rows /
+    sampled rows, which restores the population distribution when passed to fit().
+    holdout_every=k leaves out rows whose file position is a multiple of k (see is_holdout).
+    """
+    src = f"read_parquet('{Path(path).as_posix()}', file_row_number=true)"
+    if holdout_every:
+        src = f"(SELECT * FROM {src} WHERE file_row_number % {int(holdout_every)} <> 0)"
+    part = ", ".join(strata)
+    con = duckdb.connect()
+    try:
+        n_strata = con.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {part} FROM {src})").fetchone()[0]
+        cap = max(int(max_rows // max(n_strata, 1)), 1)
+        con.execute("SELECT setseed(?)", [seed])
+        table = con.execute(f"""
+            SELECT {", ".join(columns)}, sample_weight FROM (
+              SELECT {", ".join(dict.fromkeys(columns + strata))},
+                     ROW_NUMBER() OVER (PARTITION BY {part} ORDER BY random()) AS rn,
+                     COUNT(*) OVER (PARTITION BY {part}) * 1.0
+                       / LEAST(COUNT(*) OVER (PARTITION BY {part}), {cap}) AS sample_weight
+              FROM {src}
+            )
+            WHERE rn <= {cap}
+        """).fetch_arrow_table()
+    finally:
+        con.close()
+    return _to_pandas(table)
+
+def dataset_fingerprint(path: Path = DATASET_PATH) -> str:
+    """Cheap identity of the current dataset file (size + mtime)."""
+    st = Path(path).stat()
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def is_holdout(offset: int, n: int, every: int):
+    """Holdout mask for rows [offset, offset + n) of the file, matching stratified_sample."""
+    return (np.arange(offset, offset + n) % every) == 0
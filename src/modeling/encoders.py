@@ -0,0 +1,87 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.model_selection import KFold
+
+# Compact encoders for the high-cardinality location columns (district, county) in the ridge
+# model, as alternatives to one-hot. Used by train_price_model.ridge_pipeline(encoder=...);
+# sklearn's TargetEncoder covers plain out-of-fold target encoding.
+
+class HashingEncoder(TransformerMixin, BaseEstimator):
+    """Hash "column=value" tokens into a fixed number of sparse columns."""
+
+    def __init__(self, n_features: int = 256):
+        self.n_features = n_features
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(list(X.columns), dtype=object)
+        return self
+
+    def transform(self, X):
+        tokens = zip(*[(f"{c}=" + X[c].astype(str)).tolist() for c in self.feature_names_in_])
+        hasher = FeatureHasher(n_features=self.n_features, input_type="string", alternate_sign=True)
+        return hasher.transform(tokens).astype(np.float32)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"hash_{i}" for i in range(self.n_features)], dtype=object)
+
+class HierarchicalTargetEncoder(TransformerMixin, BaseEstimator):
+    """
+    Shrunk target means for a parent/child pair of columns (county, district):
+      county   -> (n_c * mean_c + m * global) / (n_c + m)
+      district -> (n_d * mean_d + m * county) / (n_d + m)
+    so small districts borrow strength from their county instead of from the national mean.
+    fit_transform returns out-of-fold encodings (like sklearn's TargetEncoder) so training
+    rows never see their own target.
+    """
+
+    def __init__(self, parent: str = "county", child: str = "district", shrinkage: float = 50.0,
+                 cv: int = 5, random_state: int = 42):
+        self.parent = parent
+        self.child = child
+        self.shrinkage = shrinkage
+        self.cv = cv
+        self.random_state = random_state
+
+    def _stats(self, keys: pd.DataFrame, y: np.ndarray) -> tuple:
+        frame = keys.assign(_y=y)
+        glob = float(y.mean())
+        m = self.shrinkage
+        p = frame.groupby(self.parent, observed=True)["_y"].agg(["sum", "count"])
+        parent = (p["sum"] + m * glob) / (p["count"] + m)
+        c = frame.groupby([self.parent, self.child], observed=True)["_y"].agg(["sum", "count"])
+        prior = parent.reindex(c.index.get_level_values(0)).to_numpy()
+        child = (c["sum"] + m * prior) / (c["count"] + m)
+        return glob, parent, child
+
+    @staticmethod
+    def _apply(keys: pd.DataFrame, stats: tuple, parent_col: str, child_col: str) -> np.ndarray:
+        glob, parent, child = stats
+        p = keys[parent_col].map(parent).astype(float).fillna(glob).to_numpy()
+        idx = pd.MultiIndex.from_frame(keys[[parent_col, child_col]].astype(object))
+        c = child.reindex(idx).to_numpy(dtype=float)
+        c = np.where(np.isnan(c), p, c)  # unseen district -> its county's encoding
+        return np.column_stack([p, c]).astype(np.float32)
+
+    def fit(self, X, y):
+        self.feature_names_in_ = np.asarray(list(X.columns), dtype=object)
+        self.stats_ = self._stats(X[[self.parent, self.child]].astype(object), np.asarray(y, dtype=float))
+        return self
+
+    def fit_transform(self, X, y=None, **fit_params):
+        keys = X[[self.parent, self.child]].astype(object).reset_index(drop=True)
+        y = np.asarray(y, dtype=float)
+        self.fit(X, y)
+        out = np.empty((len(keys), 2), dtype=np.float32)
+        for train, test in KFold(self.cv, shuffle=True, random_state=self.random_state).split(keys):
+            fold = self._stats(keys.iloc[train], y[train])
+            out[test] = self._apply(keys.iloc[test], fold, self.parent, self.child)
+        return out
+
+    def transform(self, X):
+        return self._apply(X[[self.parent, self.child]].astype(object), self.stats_, self.parent, self.child)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"{self.parent}_te", f"{self.child}_te"], dtype=object)
@@ -1,10 +1,11 @@
 from __future__ import annotations
-import joblib
 import pandas as pd
 import numpy as np
 
+from src.modeling.registry import load_model
+
 def main():
-    model = joblib.load("models/ridge_price_model.joblib")
+    model = load_model("ridge")
     pre = model.named_steps["pre"]
     ridge = model.named_steps["model"]
 
@@ -1,43 +1,87 @@
-
 from __future__ import annotations
-import joblib
+import json
+import os
+import shutil
+from pathlib import Path
 import pandas as pd
 import numpy as np
-import shap
-from sklearn.model_selection import train_test_split
 
-def main():
-    df = pd.read_parquet("data/processed/model_dataset.parquet")
+from src.modeling.dataset import load_dataset, take_rows, dataset_fingerprint, FEATURES
+from src.modeling.feature_store import open_matrix
+from src.modeling.profiling import StageTimer
+from src.modeling.registry import load_model, model_key
+from src.modeling.tree_shap import TreeShap
+
+# Exact tree SHAP for the HGBR model over a large sample (make shap). Results are cached under
+# data/shap/<model version>-<dataset>-<rows>/ and copied to reports/, so reruns with an
+# unchanged model and dataset cost nothing. Encoded rows come from the feature store (make
+# features) when it matches the model's preprocessor and the dataset; otherwise the sample is
+# drawn in the Parquet scan and encoded here.
 
-    y = df["log_price"].astype(float)
-    X = df[
-        ["year", "month", "quarter",
-         "property_type", "is_new_build", "duration", "is_freehold",
-         "district", "county"]
-    ].copy()
+SAMPLE_ROWS = int(os.getenv("SHAP_SAMPLE_ROWS", "500000"))
+CACHE_DIR = Path("data/shap")
+OUTPUTS = ["shap_feature_importance.csv", "shap_by_district.csv", "shap_by_property_type.csv"]
 
-    model = joblib.load("models/hgbr_price_model.joblib")
+def _by_group(values: pd.DataFrame, keys: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    """Mean signed attribution per feature for each group, plus the group's mean |attribution|."""
+    frame = pd.concat([keys[by].reset_index(drop=True), values], axis=1)
+    g = frame.groupby(by, observed=True)
+    out = g[list(values.columns)].mean()
+    out.insert(0, "n", g.size())
+    out.insert(1, "mean_abs_shap", values.abs().sum(axis=1).groupby([frame[c] for c in by], observed=True).mean())
+    return out.sort_values("n", ascending=False)
+
+def main():
+    model = load_model("hgbr")
     pre = model.named_steps["pre"]
     gbr = model.named_steps["model"]
+    feature_names = [str(f) for f in pre.get_feature_names_out()]
 
-    # transform features (dense matrix) and keep feature names
-    X_enc = pre.transform(X)
-    feature_names = pre.get_feature_names_out()
-
-    # SHAP on a sample (to keep it fast)
-    rng = np.random.default_rng(42)
-    idx = rng.choice(X_enc.shape[0], size=min(5000, X_enc.shape[0]), replace=False)
-    X_sample = X_enc[idx]
+    key = f"{model_key('hgbr')}-{dataset_fingerprint()}-{SAMPLE_ROWS}"
+    cache = CACHE_DIR / key
+    Path("reports").mkdir(exist_ok=True)
+    if not (cache / "meta.json").exists():
+        timer = StageTimer("shap")
+        stored = open_matrix("hgbr", pre)
+        if stored is not None:
+            # rows gathered from the memory-mapped encoded matrix; only the grouping columns
+            # of those rows are read back from Parquet
+            X_enc = stored[0]
+            rng = np.random.default_rng(42)
+            idx = np.sort(rng.choice(X_enc.shape[0], size=min(SAMPLE_ROWS, X_enc.shape[0]), replace=False))
+            X = np.asarray(X_enc[idx], dtype=float)
+            df = take_rows(["county", "district", "property_type"], idx)
+        else:
+            df = load_dataset(columns=FEATURES, sample_rows=SAMPLE_ROWS)
+            X = pre.transform(df[FEATURES])
+        explainer = TreeShap(gbr)
+        phi = pd.DataFrame(explainer.shap_values(X), columns=feature_names)
+        timer.add(len(df))
 
-    explainer = shap.Explainer(gbr.predict, X_sample, feature_names=feature_names)
-    shap_values = explainer(X_sample)
+        tmp = cache.with_name(cache.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        # Global ranking: mean absolute SHAP value per feature
+        (pd.DataFrame({"feature": feature_names, "mean_abs_shap": phi.abs().mean(axis=0).to_numpy()})
+           .sort_values("mean_abs_shap", ascending=False)
+           .to_csv(tmp / OUTPUTS[0], index=False))
+        _by_group(phi, df, ["county", "district"]).to_csv(tmp / OUTPUTS[1])
+        _by_group(phi, df, ["property_type"]).to_csv(tmp / OUTPUTS[2])
+        (tmp / "meta.json").write_text(json.dumps({
+            "rows": len(df),
+            "expected_value": explainer.expected_value,
+            "leaves": len(explainer.leaves),
+            **timer.report(),
+        }, indent=2), encoding="utf-8")
+        shutil.rmtree(cache, ignore_errors=True)
+        tmp.rename(cache)
+    else:
+        print(f"✓ SHAP results cached for this model and dataset ({cache})")
 
-    # Save summary as a CSV: mean absolute SHAP value per feature
-    mean_abs = np.abs(shap_values.values).mean(axis=0)
-    shap_rank = (pd.DataFrame({"feature": feature_names, "mean_abs_shap": mean_abs})
-                   .sort_values("mean_abs_shap", ascending=False))
-    shap_rank.to_csv("reports/shap_feature_importance.csv", index=False)
-    print(shap_rank.head(30).to_string(index=False))
+    for name in OUTPUTS:
+        shutil.copyfile(cache / name, Path("reports") / name)
+    print(pd.read_csv(cache / OUTPUTS[0]).head(30).to_string(index=False))
+    print(f"✓ Saved {', '.join('reports/' + n for n in OUTPUTS)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import json
+import shutil
+from pathlib import Path
+import joblib
+import numpy as np
+import scipy.sparse as sp
+
+from src.modeling.dataset import iter_batches, dataset_fingerprint, FEATURES, TARGET
+from src.modeling.profiling import StageTimer
+from src.modeling.registry import load_model
+
+# Encoded design matrices, computed once per (fitted preprocessor, dataset) and reused by
+# SHAP, residual analysis and evaluation instead of re-running pre.transform on every script.
+#
+#   data/features/<name>-<key>/
+#     meta.json          shapes, dtypes, feature names
+#     y.bin              float32 target
+#     X.bin              float32 dense matrix (ordinal encoding, HGBR)        -- or --
+#     data.bin / indices.bin / indptr.bin   CSR parts (one-hot encoding, Ridge)
+#
+# Everything is raw little-endian arrays opened with np.memmap, so readers get zero-copy views.
+
+STORE_DIR = Path("data/features")
+BATCH_ROWS = 1_000_000
+
+MODELS = ["ridge", "hgbr"]
+
+def preprocessor_version(pre) -> str:
+    """Content hash of the fitted preprocessor (categories, passthrough columns, params)."""
+    return joblib.hash(pre)[:12]
+
+def matrix_dir(name: str, pre) -> Path:
+    return STORE_DIR / f"{name}-{preprocessor_version(pre)}-{dataset_fingerprint()}"
+
+class _Appender:
+    """Append arrays batch by batch to a raw binary file, tracking dtype and length."""
+
+    def __init__(self, path: Path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.n = 0
+        self.f = path.open("wb")
+
+    def write(self, arr) -> None:
+        arr = np.ascontiguousarray(arr, dtype=self.dtype)
+        self.f.write(arr.tobytes())
+        self.n += arr.shape[0]
+
+    def close(self) -> dict:
+        self.f.close()
+        return {"dtype": self.dtype.str, "length": self.n}
+
+def build_matrix(name: str, pre, batch_rows: int = BATCH_ROWS) -> Path:
+    out_dir = matrix_dir(name, pre)
+    if (out_dir / "meta.json").exists():
+        print(f"✓ {name}: up to date ({out_dir})")
+        return out_dir
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    timer = StageTimer(f"feature_store:{name}")
+    y_out = _Appender(tmp_dir / "y.bin", np.float32)
+    dense_out = sparse_out = None
+    n_cols = None
+    nnz = 0
+
+    for df in iter_batches(columns=FEATURES + [TARGET], batch_rows=batch_rows):
+        X = pre.transform(df[FEATURES])
+        n_cols = X.shape[1]
+        if sp.issparse(X):
+            X = X.tocsr()
+            if sparse_out is None:
+                sparse_out = {
+                    "data": _Appender(tmp_dir / "data.bin", np.float32),
+                    "indices": _Appender(tmp_dir / "indices.bin", np.int32),
+                    "indptr": _Appender(tmp_dir / "indptr.bin", np.int64),
+                }
+                sparse_out["indptr"].write(np.zeros(1, dtype=np.int64))
+            sparse_out["data"].write(X.data)
+            sparse_out["indices"].write(X.indices)
+            sparse_out["indptr"].write(X.indptr[1:].astype(np.int64) + nnz)
+            nnz += X.nnz
+        else:
+            if dense_out is None:
+                dense_out = _Appender(tmp_dir / "X.bin", np.float32)
+            dense_out.write(X)
+        y_out.write(df[TARGET].to_numpy())
+        timer.add(len(df))
+
+    meta = {
+        "name": name,
+        "preprocessor_version": preprocessor_version(pre),
+        "dataset": dataset_fingerprint(),
+        "n_rows": y_out.n,
+        "n_cols": n_cols,
+        "feature_names": [str(f) for f in pre.get_feature_names_out()],
+        "format": "csr" if sparse_out is not None else "dense",
+        "arrays": {"y": y_out.close()},
+    }
+    if sparse_out is not None:
+        for part, app in sparse_out.items():
+            meta["arrays"][part] = app.close()
+        if nnz < np.iinfo(np.int32).max:
+            # scipy would downcast int64 indptr to match int32 indices (a copy); store it that way
+            indptr = np.fromfile(tmp_dir / "indptr.bin", dtype=np.int64).astype(np.int32)
+            indptr.tofile(tmp_dir / "indptr.bin")
+            meta["arrays"]["indptr"]["dtype"] = np.dtype(np.int32).str
+    elif dense_out is not None:
+        meta["arrays"]["X"] = dense_out.close()
+
+    (tmp_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp_dir.rename(out_dir)
+    timer.report()
+    print(f"✓ {name}: saved {meta['format']} matrix {meta['n_rows']:,} x {n_cols} to {out_dir}")
+    return out_dir
+
+def _memmap(path: Path, spec: dict) -> np.ndarray:
+    if spec["length"] == 0:
+        return np.empty(0, dtype=np.dtype(spec["dtype"]))
+    return np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r")
+
+def open_matrix(name: str, pre):
+    """
+    (X, y, meta) for the stored matrix matching this fitted preprocessor and the current
+    dataset, or None if it has not been built. X is a read-only memmap (dense) or a CSR
+    matrix whose parts are memmaps; nothing is copied into RAM until it is used.
+    """
+    out_dir = matrix_dir(name, pre)
+    meta_path = out_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    arrays = {k: _memmap(out_dir / f"{k}.bin", spec) for k, spec in meta["arrays"].items()}
+    shape = (meta["n_rows"], meta["n_cols"])
+    if meta["format"] == "csr":
+        X = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    else:
+        X = arrays["X"].reshape(shape)
+    return X, arrays["y"], meta
+
+def main():
+    for name in MODELS:
+        model = load_model(name)
+        build_matrix(name, model.named_steps["pre"])
+
+if __name__ == "__main__":
+    main()
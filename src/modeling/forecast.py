@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import os
+import time
+import warnings
+from datetime import datetime, timezone
 from pathlib import Path
 import duckdb
+import joblib
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
@@ -11,6 +15,19 @@ from statsmodels.tsa.statespace.sarimax import SARIMAX
 
 load_dotenv()
 
+# Fitted SARIMAX state is cached per series in models/forecast_cache/sarimax.joblib, so a
+# monthly refresh does not re-estimate from scratch (see refresh_sarimax). Every refresh is
+# appended to reports/forecast_refresh_log.csv (REFRESH_LOG_COLUMNS, shared with forecast_batch)
+# with its mode and wall time.
+
+FIT_CACHE_PATH = Path("models/forecast_cache/sarimax.joblib")
+REFRESH_LOG = Path("reports/forecast_refresh_log.csv")
+REFRESH_LOG_COLUMNS = ["run_at", "series_id", "target", "model", "status", "refresh",
+                       "n_obs", "n_new", "recent_rmse", "refresh_seconds"]
+REFIT_EVERY = int(os.getenv("FORECAST_REFIT_EVERY", "12"))       # new months before re-estimating
+DEGRADE_RATIO = float(os.getenv("FORECAST_DEGRADE_RATIO", "1.5"))
+DIAG_WINDOW = 12
+
 def db_path() -> str:
     return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
 
@@ -29,17 +46,99 @@ def mape(y_true, y_pred):
     mask = y_true != 0
     return np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask]))
 
-def fit_sarimax(train_series: pd.Series, order=(1,1,1), seasonal_order=(1,1,1,12)):
-    model = SARIMAX(
+def make_sarimax(train_series: pd.Series, order=(1,1,1), seasonal_order=(1,1,1,12)):
+    return SARIMAX(
         train_series,
         order=order,
         seasonal_order=seasonal_order,
         enforce_stationarity=False,
         enforce_invertibility=False
     )
-    res = model.fit(disp=False)
+
+def fit_sarimax(train_series: pd.Series, order=(1,1,1), seasonal_order=(1,1,1,12), **fit_kwargs):
+    model = make_sarimax(train_series, order=order, seasonal_order=seasonal_order)
+    res = model.fit(disp=False, **fit_kwargs)
     return res
 
+def recent_rmse(res, window: int = DIAG_WINDOW) -> float:
+    """RMSE of the one-step-ahead forecast errors over the last `window` observations."""
+    err = np.asarray(res.forecasts_error[0][-window:], dtype=float)
+    return float(np.sqrt(np.nanmean(err ** 2)))
+
+def load_fit_cache() -> dict:
+    return joblib.load(FIT_CACHE_PATH) if FIT_CACHE_PATH.exists() else {}
+
+def save_fit_cache(cache: dict) -> None:
+    FIT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = FIT_CACHE_PATH.with_suffix(".tmp")
+    joblib.dump(cache, tmp)
+    os.replace(tmp, FIT_CACHE_PATH)
+
+def refresh_sarimax(train_series: pd.Series, state: dict | None, order=(1,1,1), seasonal_order=(1,1,1,12),
+                    **fit_kwargs):
+    """
+    Fit or update one series from its cached state; returns (results, new state, info).
+      filter  cached parameters re-run through the Kalman filter over the longer history, no
+              optimisation; used until REFIT_EVERY new months have arrived since the last
+              estimate, as long as the one-step RMSE over the last DIAG_WINDOW months stays
+              within DEGRADE_RATIO x its value at estimation time
+      warm    re-estimated with the cached parameters as start_params (schedule or degradation)
+      cold    default start parameters (no cached state, or the model spec changed)
+    """
+    t0 = time.perf_counter()
+    spec = [list(order), list(seasonal_order)]
+    n_obs = len(train_series)
+    model = make_sarimax(train_series, order=order, seasonal_order=seasonal_order)
+    usable = state is not None and state["spec"] == spec and n_obs >= state["n_obs"]
+    n_new = n_obs - state["n_obs"] if usable else n_obs
+
+    mode, res, rmse = "cold", None, np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if usable and state["months_since_estimate"] + n_new < REFIT_EVERY:
+            res = model.filter(np.asarray(state["params"]))
+            rmse = recent_rmse(res)
+            if np.isfinite(rmse) and rmse <= DEGRADE_RATIO * state["baseline_rmse"]:
+                mode = "filter"
+        if mode != "filter" and usable:
+            res = model.fit(start_params=np.asarray(state["params"]), disp=False, **fit_kwargs)
+            mode = "warm"
+        elif mode != "filter":
+            res = model.fit(disp=False, **fit_kwargs)
+
+    if mode == "filter":
+        new_state = {**state, "n_obs": n_obs, "months_since_estimate": state["months_since_estimate"] + n_new}
+    else:
+        rmse = recent_rmse(res)
+        new_state = {
+            "spec": spec,
+            "params": np.asarray(res.params, dtype=float),
+            "n_obs": n_obs,
+            "months_since_estimate": 0,
+            "baseline_rmse": rmse,
+            "estimated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+    info = {"refresh": mode, "n_obs": n_obs, "n_new": n_new, "recent_rmse": rmse,
+            "refresh_seconds": time.perf_counter() - t0}
+    return res, new_state, info
+
+def log_refresh(rows: list[dict]) -> None:
+    """
+    Append per-series refresh records to REFRESH_LOG with the fixed REFRESH_LOG_COLUMNS
+    (missing fields are left empty, extra ones dropped). A log written with another header
+    is moved aside to forecast_refresh_log.old.csv rather than appended to.
+    """
+    REFRESH_LOG.parent.mkdir(exist_ok=True)
+    if REFRESH_LOG.exists():
+        with REFRESH_LOG.open(encoding="utf-8") as f:
+            header = f.readline().strip()
+        if header != ",".join(REFRESH_LOG_COLUMNS):
+            os.replace(REFRESH_LOG, REFRESH_LOG.with_suffix(".old.csv"))
+    log = pd.DataFrame(rows).assign(
+        run_at=datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+    ).reindex(columns=REFRESH_LOG_COLUMNS)
+    log.to_csv(REFRESH_LOG, mode="a", header=not REFRESH_LOG.exists(), index=False)
+
 def forecast_next(res, steps: int):
     pred = res.get_forecast(steps=steps)
     mean = pred.predicted_mean
@@ -66,7 +165,15 @@ def main():
     train = train.set_index("month")
     test = test.set_index("month")
 
-    res_vol = fit_sarimax(train["sales_volume"], order=(1,1,1), seasonal_order=(1,1,1,12))
+    # keyed apart from forecast_batch's full-history "national" entries: these fits stop at the holdout
+    cache = load_fit_cache()
+    refreshes = []
+    res_vol, cache[("national_train", "sales_volume")], info = refresh_sarimax(
+        train["sales_volume"], cache.get(("national_train", "sales_volume")), order=(1,1,1), seasonal_order=(1,1,1,12)
+    )
+    refreshes.append({"series_id": "national_train", "target": "sales_volume", "model": "sarimax",
+                      "status": "ok", **info})
+    print(f"Sales Volume refresh: {info['refresh']} in {info['refresh_seconds']:.2f}s")
 
     # Backtest on test horizon
     pred_test = res_vol.get_forecast(steps=len(test)).predicted_mean
@@ -92,7 +199,14 @@ def main():
     test = test.set_index("month")
 
     # Median price is often non-stationary; SARIMAX (1,1,1)(1,1,1,12) works well as a baseline
-    res_price = fit_sarimax(train["median_price"], order=(1,1,1), seasonal_order=(1,1,1,12))
+    res_price, cache[("national_train", "median_price")], info = refresh_sarimax(
+        train["median_price"], cache.get(("national_train", "median_price")), order=(1,1,1), seasonal_order=(1,1,1,12)
+    )
+    refreshes.append({"series_id": "national_train", "target": "median_price", "model": "sarimax",
+                      "status": "ok", **info})
+    print(f"Median Price refresh: {info['refresh']} in {info['refresh_seconds']:.2f}s")
+    save_fit_cache(cache)
+    log_refresh(refreshes)
 
     pred_test = res_price.get_forecast(steps=len(test)).predicted_mean
     price_mae = np.mean(np.abs(test["median_price"].values - pred_test.values))
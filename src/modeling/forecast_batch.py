@@ -0,0 +1,259 @@
+from __future__ import annotations
+import os
+import time
+import warnings
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from joblib import Parallel, delayed, parallel_config
+
+from src.modeling.forecast import refresh_sarimax, load_fit_cache, save_fit_cache, log_refresh
+from src.modeling.profiling import StageTimer
+
+load_dotenv()
+
+# Batch forecasting for every national / county / district series (make forecast_batch).
+#
+# Series come from mart.monthly_kpis, mart.monthly_by_county and mart.monthly_by_district on a
+# complete month grid (months without sales: volume 0, median price carried forward). Each
+# (series, target) is one task in a process pool; a task fits the same SARIMAX spec as
+# forecast.py and falls back to a seasonal naive forecast when the history is too short, the
+# fit raises, runs past SERIES_TIMEOUT_S, or returns non-finite values. Fits are refreshed
+# from the shared SARIMAX cache (forecast.refresh_sarimax), so most monthly runs only filter.
+#
+# sales_volume is reconciled so districts add up to counties and counties to the national
+# total (WLS with structural weights, then bottom level clipped at 0 and re-aggregated);
+# intervals are shifted by the reconciliation adjustment. Medians do not aggregate, so
+# median_price keeps its base forecast. Everything lands in mart.forecasts.
+
+HORIZON = 12
+SEASON = 12
+MIN_HISTORY = 3 * SEASON
+TARGETS = ["sales_volume", "median_price"]
+ADDITIVE_TARGETS = ["sales_volume"]
+LEVELS = ["national", "county", "district"]
+SERIES_TIMEOUT_S = float(os.getenv("FORECAST_SERIES_TIMEOUT", "30"))
+N_JOBS = int(os.getenv("FORECAST_N_JOBS", "-1"))
+Z_95 = 1.959964
+FITS_PATH = Path("reports/forecast_batch_fits.csv")
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+class SeriesTimeout(Exception):
+    pass
+
+def load_panel(con) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """
+    (series, panels): series has one row per node (series_id, level, county, district) in
+    national -> county -> district order; panels[target] is months x series_id.
+    """
+    frames = [
+        con.execute("""
+            SELECT month, 'national' AS level, NULL AS county, NULL AS district,
+                   sales_volume, median_price
+            FROM mart.monthly_kpis
+        """).fetchdf(),
+        con.execute("""
+            SELECT month, 'county' AS level, county, NULL AS district, sales_volume, median_price
+            FROM mart.monthly_by_county
+        """).fetchdf(),
+        con.execute("""
+            SELECT month, 'district' AS level, county, district, sales_volume, median_price
+            FROM mart.monthly_by_district
+        """).fetchdf(),
+    ]
+    long = pd.concat(frames, ignore_index=True)
+    long["month"] = pd.to_datetime(long["month"])
+    long["series_id"] = np.select(
+        [long["level"] == "national", long["level"] == "county"],
+        ["national", long["county"].astype(str)],
+        long["county"].astype(str) + "|" + long["district"].astype(str),
+    )
+
+    series = (long[["series_id", "level", "county", "district"]].drop_duplicates("series_id")
+              .assign(_lvl=lambda d: d["level"].map(LEVELS.index))
+              .sort_values(["_lvl", "county", "district"], na_position="first")
+              .drop(columns="_lvl").reset_index(drop=True))
+    months = pd.date_range(long["month"].min(), long["month"].max(), freq="MS")
+    panels = {}
+    for target in TARGETS:
+        wide = long.pivot(index="month", columns="series_id", values=target).reindex(months)
+        wide = wide[series["series_id"]]
+        panels[target] = wide.fillna(0.0) if target in ADDITIVE_TARGETS else wide.ffill()
+    return series, panels
+
+def seasonal_naive(y: np.ndarray, horizon: int, season: int = SEASON) -> tuple[np.ndarray, np.ndarray]:
+    """Last observed season repeated; sd from the seasonal differences, growing per season."""
+    y = y[~np.isnan(y)]
+    if len(y) == 0:
+        return np.full(horizon, np.nan), np.full(horizon, np.nan)
+    if len(y) < season:
+        return np.full(horizon, y[-1]), np.full(horizon, np.std(y))
+    steps = np.arange(horizon)
+    mean = y[len(y) - season + steps % season]
+    resid = y[season:] - y[:-season]
+    sd = np.std(resid) if len(resid) > 1 else 0.0
+    return mean, sd * np.sqrt(steps // season + 1)
+
+def _sarimax(y: np.ndarray, horizon: int, deadline: float, state: dict | None):
+    def _check(_params):
+        if time.perf_counter() > deadline:
+            raise SeriesTimeout()
+
+    res, new_state, info = refresh_sarimax(pd.Series(y), state, order=(1, 1, 1),
+                                           seasonal_order=(1, 1, 1, SEASON), callback=_check)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pred = res.get_forecast(steps=horizon)
+    mean = np.asarray(pred.predicted_mean, dtype=float)
+    ci = np.asarray(pred.conf_int(alpha=0.05), dtype=float)
+    return mean, ci[:, 0], ci[:, 1], float(res.aic), new_state, info
+
+def forecast_series(series_id: str, target: str, y: np.ndarray, horizon: int = HORIZON,
+                    timeout: float = SERIES_TIMEOUT_S, state: dict | None = None) -> dict:
+    """SARIMAX forecast with a seasonal naive fallback; never raises. A failed fit keeps `state`."""
+    t0 = time.perf_counter()
+    status, aic = "ok", np.nan
+    info = {"refresh": "none", "n_new": np.nan, "recent_rmse": np.nan, "refresh_seconds": np.nan}
+    valid = y[~np.isnan(y)]
+    if len(valid) < MIN_HISTORY or np.ptp(valid) == 0:
+        status = "short_history"
+    else:
+        try:
+            mean, lower, upper, aic, new_state, fit_info = _sarimax(valid, horizon, t0 + timeout, state)
+            if not (np.isfinite(mean).all() and np.isfinite(lower).all() and np.isfinite(upper).all()):
+                status = "non_finite"
+            else:
+                state, info = new_state, fit_info
+        except SeriesTimeout:
+            status = "timeout"
+        except Exception as e:  # noqa: BLE001 - any fit failure falls back
+            status = f"error: {type(e).__name__}"
+    if status == "ok":
+        model = "sarimax"
+    else:
+        model = "seasonal_naive"
+        mean, sd = seasonal_naive(valid, horizon)
+        lower, upper = mean - Z_95 * sd, mean + Z_95 * sd
+    return {
+        "series_id": series_id, "target": target, "model": model, "status": status,
+        "mean": mean, "lower": lower, "upper": upper, "aic": aic,
+        "n_obs": len(valid), "refresh": info["refresh"], "n_new": info["n_new"],
+        "recent_rmse": info["recent_rmse"], "refresh_seconds": info["refresh_seconds"],
+        "fit_seconds": time.perf_counter() - t0, "state": state,
+    }
+
+def summing_matrix(series: pd.DataFrame) -> np.ndarray:
+    """S (all nodes x district nodes): each node's row sums the districts below it."""
+    bottom = series[series["level"] == "district"].reset_index(drop=True)
+    S = np.zeros((len(series), len(bottom)))
+    for i, node in enumerate(series.itertuples(index=False)):
+        if node.level == "national":
+            S[i] = 1.0
+        elif node.level == "county":
+            S[i] = (bottom["county"] == node.county).to_numpy(dtype=float)
+        else:
+            S[i] = ((bottom["county"] == node.county) & (bottom["district"] == node.district)).to_numpy(dtype=float)
+    return S
+
+def reconcile(base: np.ndarray, S: np.ndarray, nonnegative: bool = True) -> np.ndarray:
+    """
+    WLS reconciliation with structural weights W = diag(S 1):
+    bottom = (S' W^-1 S)^-1 S' W^-1 base, reconciled = S bottom. base is (nodes x horizon).
+    Nodes with no district below them (e.g. a county whose districts were all filtered out)
+    take no part in the solve and keep their base forecasts.
+    """
+    n_below = S.sum(axis=1)
+    covered = n_below > 0
+    if not covered.any():
+        return base.copy()
+    Sc = S[covered]
+    StW = Sc.T / n_below[covered]
+    bottom = np.linalg.solve(StW @ Sc, StW @ base[covered])
+    if nonnegative:
+        bottom = np.maximum(bottom, 0.0)
+    out = base.astype(float, copy=True)
+    out[covered] = Sc @ bottom
+    return out
+
+def main():
+    con = duckdb.connect(db_path())
+    series, panels = load_panel(con)
+    con.close()
+    months = panels[TARGETS[0]].index
+    future = pd.date_range(months[-1] + pd.offsets.MonthBegin(1), periods=HORIZON, freq="MS")
+    print(f"{len(series):,} series x {len(TARGETS)} targets, {len(months)} months "
+          f"({(series['level'] == 'district').sum():,} districts)")
+
+    cache = load_fit_cache()
+    timer = StageTimer("forecast_batch:fit")
+    tasks = [(sid, target, panels[target][sid].to_numpy(dtype=float))
+             for target in TARGETS for sid in series["series_id"]]
+    with parallel_config(backend="loky", inner_max_num_threads=1):
+        results = Parallel(n_jobs=N_JOBS)(
+            delayed(forecast_series)(sid, t, y, state=cache.get((sid, t))) for sid, t, y in tasks
+        )
+    timer.add(len(results))
+    timer.report()
+    for r in results:
+        if r["state"] is not None:
+            cache[(r["series_id"], r["target"])] = r["state"]
+    save_fit_cache(cache)
+
+    by_key = {(r["series_id"], r["target"]): r for r in results}
+    S = summing_matrix(series)
+    parts = []
+    for target in TARGETS:
+        rs = [by_key[(sid, target)] for sid in series["series_id"]]
+        base = np.vstack([r["mean"] for r in rs])
+        lower = np.vstack([r["lower"] for r in rs])
+        upper = np.vstack([r["upper"] for r in rs])
+        if target in ADDITIVE_TARGETS:
+            rec = reconcile(np.nan_to_num(base), S)
+            lower, upper = lower + rec - base, upper + rec - base
+        else:
+            rec = base
+        n = len(series)
+        parts.append(pd.DataFrame({
+            "level": np.repeat(series["level"].to_numpy(), HORIZON),
+            "county": np.repeat(series["county"].to_numpy(), HORIZON),
+            "district": np.repeat(series["district"].to_numpy(), HORIZON),
+            "target": target,
+            "month": np.tile(future.to_numpy(), n),
+            "model": np.repeat([r["model"] for r in rs], HORIZON),
+            "base_forecast": base.ravel(),
+            "forecast": rec.ravel(),
+            "lower": lower.ravel(),
+            "upper": upper.ravel(),
+        }))
+    out = pd.concat(parts, ignore_index=True)
+
+    fits = pd.DataFrame([{k: v for k, v in r.items() if k not in ("mean", "lower", "upper", "state")}
+                         for r in results])
+    fits = series.merge(fits, on="series_id")
+    Path("reports").mkdir(exist_ok=True)
+    fits.to_csv(FITS_PATH, index=False)
+    # refresh_seconds is the SARIMAX fit/filter alone; fit_seconds also covers forecasting and fallback
+    log_refresh(fits.to_dict("records"))
+    print(fits.groupby(["target", "model", "status", "refresh"]).size().rename("series").to_string())
+    print(fits.groupby("refresh")["fit_seconds"].describe()[["count", "mean", "max"]].round(3).to_string())
+
+    # coherence check on the reconciled volumes
+    vol = out[out["target"] == "sales_volume"]
+    nat = vol.loc[vol["level"] == "national", "forecast"].to_numpy()
+    dist = vol[vol["level"] == "district"].groupby("month")["forecast"].sum().to_numpy()
+    print(f"Max |national - sum(districts)| sales_volume: {np.abs(nat - dist).max():.2e}")
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.register("df_fc", out)
+    con.execute("DROP TABLE IF EXISTS mart.forecasts;")
+    con.execute("CREATE TABLE mart.forecasts AS SELECT * FROM df_fc;")
+    con.close()
+    print(f"✓ Wrote mart.forecasts ({len(out):,} rows), {FITS_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import os
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed, parallel_config
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+# Choosing k for the segmentation scripts without the O(n^2) full silhouette.
+#
+# The encoded matrix is built once by the caller and shared with one worker process per
+# candidate k (joblib memory-maps large arrays instead of pickling them per task). Each worker
+# fits the candidate once and scores it with:
+#   silhouette     mean of SIL_DRAWS silhouettes on SIL_SAMPLE rows each
+#   calinski / davies_bouldin   O(n) / O(n k) criteria on all rows
+#   inertia -> elbow            distance below the chord of the inertia curve (kneedle)
+#   stability      mean ARI between the full fit and fits on BOOTSTRAPS resamples
+# The pick is the best mean rank over silhouette, Calinski-Harabasz, Davies-Bouldin and
+# stability; the full table (with timings) goes to reports/k_selection_<name>.csv.
+
+SIL_SAMPLE = 5_000
+SIL_DRAWS = 3
+BOOTSTRAPS = 5
+BOOTSTRAP_FRAC = 0.5
+MINIBATCH_ABOVE = 200_000   # rows above which candidates are fitted with MiniBatchKMeans
+N_JOBS = int(os.getenv("K_SELECTION_N_JOBS", "-1"))
+
+def _kmeans(k: int, n_rows: int, seed: int, n_init: int):
+    if n_rows > MINIBATCH_ABOVE:
+        return MiniBatchKMeans(n_clusters=k, batch_size=16_384, n_init=3, random_state=seed)
+    return KMeans(n_clusters=k, n_init=n_init, random_state=seed)
+
+def cluster_criteria(X, labels: np.ndarray) -> tuple[float, float]:
+    """
+    (Calinski-Harabasz, Davies-Bouldin) from per-cluster sums, so sparse X is never densified:
+    memory is O(n k) for the row-to-centroid products rather than O(n d).
+    """
+    n = X.shape[0]
+    ks, labels = np.unique(labels, return_inverse=True)
+    k = len(ks)
+    if k < 2:
+        return 0.0, 0.0
+    member = sp.csr_matrix((np.ones(n), (labels, np.arange(n))), shape=(k, n))
+    counts = np.asarray(member.sum(axis=1)).ravel()
+    sums = member @ X
+    centers = np.asarray(sums.toarray() if sp.issparse(sums) else sums, dtype=np.float64) / counts[:, None]
+    if sp.issparse(X):
+        sq_norms = np.asarray(X.multiply(X).sum(axis=1), dtype=np.float64).ravel()
+    else:
+        sq_norms = np.einsum("ij,ij->i", X, X, dtype=np.float64)
+
+    # squared distance of each row to its own centroid: |x|^2 - 2 x.c + |c|^2
+    xc = np.asarray(X @ centers.T)[np.arange(n), labels]
+    d2 = np.maximum(sq_norms - 2 * xc + (centers ** 2).sum(axis=1)[labels], 0.0)
+
+    within = d2.sum()
+    mean = counts @ centers / n
+    between = (counts * ((centers - mean) ** 2).sum(axis=1)).sum()
+    ch = float(between * (n - k) / (within * (k - 1))) if within > 0 else 1.0
+
+    scatter = np.bincount(labels, weights=np.sqrt(d2), minlength=k) / counts
+    sep = np.sqrt(((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (scatter[:, None] + scatter[None, :]) / sep
+    ratio[~np.isfinite(ratio)] = 0.0
+    np.fill_diagonal(ratio, 0.0)
+    db = float(ratio.max(axis=1).mean())
+    return ch, db
+
+def _score_k(X, k: int, n_init: int, seed: int) -> dict:
+    n = X.shape[0]
+    rng = np.random.default_rng(seed + k)
+
+    t0 = time.perf_counter()
+    km = _kmeans(k, n, seed, n_init).fit(X)
+    labels = km.labels_
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sil = [silhouette_score(X, labels, sample_size=min(SIL_SAMPLE, n), random_state=int(s))
+           for s in rng.integers(0, 2**31 - 1, SIL_DRAWS)]
+    sil_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ch, db = cluster_criteria(X, labels)
+    crit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    aris = []
+    for _ in range(BOOTSTRAPS):
+        idx = rng.choice(n, size=max(int(n * BOOTSTRAP_FRAC), k), replace=True)
+        boot = _kmeans(k, len(idx), int(rng.integers(0, 2**31 - 1)), n_init).fit(X[idx])
+        aris.append(adjusted_rand_score(labels, boot.predict(X)))
+    stab_s = time.perf_counter() - t0
+
+    return {
+        "k": k,
+        "inertia": float(km.inertia_),
+        "silhouette": float(np.mean(sil)),
+        "silhouette_std": float(np.std(sil)),
+        "calinski_harabasz": float(ch),
+        "davies_bouldin": float(db),
+        "stability_ari": float(np.mean(aris)),
+        "stability_ari_std": float(np.std(aris)),
+        "fit_s": round(fit_s, 3),
+        "silhouette_s": round(sil_s, 3),
+        "criteria_s": round(crit_s, 3),
+        "stability_s": round(stab_s, 3),
+    }
+
+def _elbow(ks: np.ndarray, inertia: np.ndarray) -> np.ndarray:
+    """Kneedle: normalized distance of each point below the chord from the first to the last k."""
+    if len(ks) < 3:
+        return np.zeros(len(ks))
+    x = (ks - ks.min()) / (ks.max() - ks.min())
+    y = (inertia - inertia.min()) / max(inertia.max() - inertia.min(), 1e-12)
+    chord = y[0] + (y[-1] - y[0]) * x
+    return chord - y
+
+def select_k(X, candidates: list[int], name: str, n_init: int = 10, seed: int = 42,
+             n_jobs: int = N_JOBS) -> tuple[int, pd.DataFrame]:
+    """Score every candidate k on X in parallel; returns (best k, comparison table)."""
+    t0 = time.perf_counter()
+    candidates = [k for k in candidates if k < X.shape[0]]
+    with parallel_config(backend="loky", inner_max_num_threads=1):
+        rows = Parallel(n_jobs=n_jobs)(delayed(_score_k)(X, k, n_init, seed) for k in candidates)
+    table = pd.DataFrame(rows).sort_values("k").reset_index(drop=True)
+    table["elbow"] = _elbow(table["k"].to_numpy(dtype=float), table["inertia"].to_numpy())
+
+    ranks = pd.concat([
+        table["silhouette"].rank(ascending=False),
+        table["calinski_harabasz"].rank(ascending=False),
+        table["davies_bouldin"].rank(ascending=True),
+        table["stability_ari"].rank(ascending=False),
+    ], axis=1)
+    table["mean_rank"] = ranks.mean(axis=1)
+    best_k = int(table.sort_values(["mean_rank", "k"]).iloc[0]["k"])
+    table["selected"] = table["k"] == best_k
+
+    Path("reports").mkdir(exist_ok=True)
+    out = Path(f"reports/k_selection_{name}.csv")
+    table.to_csv(out, index=False)
+    print(table[["k", "silhouette", "calinski_harabasz", "davies_bouldin", "stability_ari",
+                 "elbow", "mean_rank", "fit_s"]].to_string(index=False))
+    print(f"\n✓ Best k={best_k} for {name} ({time.perf_counter() - t0:.1f}s, {out})")
+    return best_k, table
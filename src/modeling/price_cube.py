@@ -0,0 +1,168 @@
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from src.modeling.dataset import dataset_fingerprint, price_from_log, DATASET_PATH, FEATURES, CAT_FEATURES
+from src.modeling.profiling import StageTimer
+from src.modeling.registry import load_model, model_key
+
+load_dotenv()
+
+# The HGBR prediction surface as a table (make cube).
+#
+# Every model feature is discrete, so instead of calling the model per listing we score each
+# valid combination once: observed (year, month) x property_type x is_new_build x observed
+# (duration, is_freehold) x observed (district, county). quarter follows from month.
+# The cube is written to data/processed/price_cube.parquet (sorted by location, then time, so
+# district/county lookups touch few row groups) and loaded into mart.price_cube. It is rebuilt
+# only when the model or the dataset changes, and a dropped table is reloaded from the Parquet
+# file. lookup() is a hash join of a batch of listings against the table; there is no index,
+# since DuckDB's ART indexes only serve selective filters, not joins.
+
+CUBE_PATH = Path("data/processed/price_cube.parquet")
+META_PATH = CUBE_PATH.with_suffix(".json")
+BATCH_ROWS = 2_000_000
+
+KEY = ["district", "county", "year", "month", "property_type", "is_new_build", "duration", "is_freehold"]
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+def _domains(path: Path = DATASET_PATH) -> dict[str, pd.DataFrame]:
+    src = f"read_parquet('{Path(path).as_posix()}')"
+    con = duckdb.connect()
+    try:
+        q = lambda cols: con.execute(f"SELECT DISTINCT {cols} FROM {src} ORDER BY ALL").fetchdf()
+        return {
+            "location": q("district, county"),
+            "period": q("year, month"),
+            "property_type": q("property_type"),
+            "is_new_build": q("is_new_build"),
+            "tenure": q("duration, is_freehold"),
+        }
+    finally:
+        con.close()
+
+def _cross(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Cartesian product of small frames, built from index arithmetic rather than merges."""
+    sizes = [len(f) for f in frames]
+    idx = np.indices(sizes).reshape(len(frames), -1)
+    return pd.concat([f.iloc[i].reset_index(drop=True) for f, i in zip(frames, idx)], axis=1)
+
+def _categorical(df: pd.DataFrame, domains: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    # fixed categories so every batch carries the same dictionary into Parquet
+    cats = {
+        "district": domains["location"]["district"].unique(),
+        "county": domains["location"]["county"].unique(),
+        "property_type": domains["property_type"]["property_type"].unique(),
+        "duration": domains["tenure"]["duration"].unique(),
+    }
+    for c, values in cats.items():
+        df[c] = pd.Categorical(df[c], categories=values)
+    return df
+
+def build_cube(model) -> int:
+    domains = _domains()
+    rest = [domains["period"], domains["property_type"], domains["is_new_build"], domains["tenure"]]
+    per_location = int(np.prod([len(f) for f in rest]))
+    locations_per_batch = max(BATCH_ROWS // max(per_location, 1), 1)
+    block = _cross(rest)
+    block["quarter"] = ((block["month"].astype(int) - 1) // 3 + 1).astype(block["month"].dtype)
+
+    timer = StageTimer("price_cube")
+    tmp = CUBE_PATH.with_suffix(".parquet.tmp")
+    writer = None
+    loc = domains["location"]
+    try:
+        for start in range(0, len(loc), locations_per_batch):
+            chunk = _cross([loc.iloc[start:start + locations_per_batch], block])
+            chunk = _categorical(chunk, domains)
+            log_price = model.predict(chunk[FEATURES]).astype(np.float32)
+            out = chunk[KEY].copy()
+            out["log_price"] = log_price
+            out["price"] = price_from_log(log_price.astype(np.float64)).round().astype(np.int64)
+            table = pa.Table.from_pandas(out, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema, compression="zstd")
+            writer.write_table(table, row_group_size=BATCH_ROWS)
+            timer.add(len(out))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, CUBE_PATH)
+    timer.report()
+    return timer.rows
+
+def load_into_duckdb() -> None:
+    con = duckdb.connect(db_path())
+    try:
+        con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+        con.execute(f"""
+            CREATE OR REPLACE TABLE mart.price_cube AS
+            SELECT * FROM read_parquet('{CUBE_PATH.as_posix()}');
+        """)
+    finally:
+        con.close()
+
+def table_exists(con: duckdb.DuckDBPyConnection) -> bool:
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'mart' AND table_name = 'price_cube'"
+    ).fetchone()[0] > 0
+
+def lookup(df: pd.DataFrame, con: duckdb.DuckDBPyConnection | None = None) -> pd.DataFrame:
+    """
+    Cube prices for the listings in `df` (any frame with the KEY columns), in input order,
+    from mart.price_cube. Combinations outside the cube (unseen district/county or month)
+    come back as NaN. `con` must be a connection to the warehouse (default: DUCKDB_PATH).
+    """
+    own = con is None
+    con = con or duckdb.connect(db_path(), read_only=True)
+    try:
+        keys = df[KEY].copy()
+        for c in CAT_FEATURES:
+            keys[c] = keys[c].astype(str)
+        keys["_row"] = np.arange(len(keys))
+        con.register("_listings", keys)
+        on = " AND ".join(f"c.{k} = l.{k}" for k in KEY)
+        out = con.execute(f"""
+            SELECT l._row, c.log_price, c.price
+            FROM _listings l
+            LEFT JOIN mart.price_cube c ON {on}
+            ORDER BY l._row
+        """).fetchdf()
+        con.unregister("_listings")
+        return out.drop(columns="_row")
+    finally:
+        if own:
+            con.close()
+
+def main():
+    model = load_model("hgbr")
+    meta = {"model_version": model_key("hgbr"), "dataset": dataset_fingerprint()}
+    if CUBE_PATH.exists() and META_PATH.exists():
+        if {k: v for k, v in json.loads(META_PATH.read_text(encoding="utf-8")).items() if k in meta} == meta:
+            con = duckdb.connect(db_path())
+            try:
+                loaded = table_exists(con)
+            finally:
+                con.close()
+            if not loaded:
+                load_into_duckdb()
+            print(f"✓ Price cube up to date ({CUBE_PATH})" + ("" if loaded else "; reloaded mart.price_cube"))
+            return
+
+    CUBE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    meta["rows"] = build_cube(model)
+    META_PATH.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    load_into_duckdb()
+    print(f"✓ Saved price cube: {CUBE_PATH} ({meta['rows']:,} rows) and mart.price_cube")
+
+if __name__ == "__main__":
+    main()
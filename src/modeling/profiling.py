@@ -0,0 +1,44 @@
+from __future__ import annotations
+import resource
+import sys
+import time
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+def matrix_mb(X) -> float:
+    """In-memory size of a dense array or a scipy sparse matrix (data + index arrays), in MB."""
+    if hasattr(X, "indptr"):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 1e6
+    return X.nbytes / 1e6
+
+class StageTimer:
+    """Wall time, throughput and peak RSS for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.t0 = time.perf_counter()
+
+    def add(self, n: int) -> None:
+        self.rows += n
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.t0
+
+    def report(self) -> dict:
+        secs = self.seconds
+        out = {
+            "stage": self.name,
+            "rows": self.rows,
+            "seconds": round(secs, 3),
+            "rows_per_sec": round(self.rows / secs, 1) if secs > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        print(f"[{self.name}] {self.rows:,} rows in {secs:.1f}s "
+              f"({out['rows_per_sec'] or 0:,.0f} rows/s), peak RSS {out['peak_rss_mb']:,.0f} MB")
+        return out
@@ -0,0 +1,176 @@
+from __future__ import annotations
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from src.modeling.dataset import load_dataset, dataset_fingerprint, FEATURES, TARGET
+
+# Versioned model registry (make registry / make bench_startup).
+#
+#   models/registry/<name>/<version>/model.joblib   uncompressed, so arrays can be memory-mapped
+#   models/registry/<name>/<version>/meta.json      dataset fingerprint, features, params, metrics
+#   models/registry/<name>/current.json             alias -> version, swapped with os.replace
+#
+# Consumers call load_model(name). Until a model has been registered, the legacy
+# models/<name>_price_model.joblib file is used.
+
+REGISTRY_DIR = Path("models/registry")
+LEGACY_PATHS = {
+    "ridge": Path("models/ridge_price_model.joblib"),
+    "hgbr": Path("models/hgbr_price_model.joblib"),
+}
+STARTUP_REPORT = Path("reports/model_startup_benchmark.csv")
+
+def _alias_path(name: str) -> Path:
+    return REGISTRY_DIR / name / "current.json"
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def current_version(name: str) -> str | None:
+    alias = _alias_path(name)
+    if not alias.exists():
+        return None
+    return json.loads(alias.read_text(encoding="utf-8"))["version"]
+
+def list_versions(name: str) -> list[str]:
+    root = REGISTRY_DIR / name
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / "meta.json").exists())
+
+def _version_dir(name: str, version: str | None) -> Path | None:
+    version = version or current_version(name)
+    return REGISTRY_DIR / name / version if version else None
+
+def model_exists(name: str) -> bool:
+    return current_version(name) is not None or LEGACY_PATHS[name].exists()
+
+def model_key(name: str) -> str:
+    """Stable identity of the model load_model(name) returns, for keying derived caches."""
+    version = current_version(name)
+    if version:
+        return version
+    st = LEGACY_PATHS[name].stat()
+    return f"legacy-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def load_model(name: str, version: str | None = None, mmap: bool = True):
+    """
+    The current (or given) version of a model. With mmap=True, numpy arrays inside the
+    pipeline (tree nodes, coefficients) are read-only memmaps of the registry file, so
+    loading costs unpickling the object graph rather than copying the arrays.
+    """
+    vdir = _version_dir(name, version)
+    path = vdir / "model.joblib" if vdir is not None else LEGACY_PATHS[name]
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+def load_meta(name: str, version: str | None = None) -> dict | None:
+    vdir = _version_dir(name, version)
+    if vdir is None:
+        return None
+    return json.loads((vdir / "meta.json").read_text(encoding="utf-8"))
+
+def promote(name: str, version: str) -> None:
+    if not (REGISTRY_DIR / name / version / "meta.json").exists():
+        raise ValueError(f"{name} has no registered version {version}")
+    _write_atomic(_alias_path(name), json.dumps({
+        "version": version,
+        "promoted_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }, indent=2))
+    print(f"✓ {name}: current -> {version}")
+
+def register(name: str, model, *, metrics: dict | None = None, train_seconds: float | None = None,
+             n_train: int | None = None, notes: str | None = None, promote_current: bool = True) -> str:
+    """Store a fitted pipeline as a new immutable version; optionally make it current."""
+    created = datetime.now(timezone.utc)
+    version = f"{created:%Y%m%dT%H%M%S}-{joblib.hash(model)[:8]}"
+    vdir = REGISTRY_DIR / name / version
+    tmp = vdir.with_name(vdir.name + ".tmp")
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    joblib.dump(model, tmp / "model.joblib")  # no compression: compressed pickles cannot be mmapped
+    estimator = model.named_steps["model"] if hasattr(model, "named_steps") else model
+    meta = {
+        "name": name,
+        "version": version,
+        "created_at": created.isoformat(timespec="seconds"),
+        "dataset": dataset_fingerprint(),
+        "features": FEATURES,
+        "target": TARGET,
+        "estimator": type(estimator).__name__,
+        "params": {k: v for k, v in estimator.get_params(deep=False).items()
+                   if isinstance(v, (int, float, str, bool, type(None)))},
+        "metrics": metrics or {},
+        "train_seconds": round(train_seconds, 2) if train_seconds is not None else None,
+        "n_train": n_train,
+        "notes": notes,
+        "sklearn": sklearn.__version__,
+        "python": platform.python_version(),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    tmp.rename(vdir)
+    print(f"✓ Registered {name} {version}")
+    if promote_current:
+        promote(name, version)
+    return version
+
+def bench_startup(repeats: int = 5) -> pd.DataFrame:
+    """Time from load call to first prediction, with and without memory mapping."""
+    X = load_dataset(columns=FEATURES, sample_rows=1)
+    rows = []
+    for name in LEGACY_PATHS:
+        if not model_exists(name):
+            continue
+        for mmap in (False, True):
+            loads, firsts = [], []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                model = load_model(name, mmap=mmap)
+                t1 = time.perf_counter()
+                model.predict(X)
+                t2 = time.perf_counter()
+                loads.append(t1 - t0)
+                firsts.append(t2 - t1)
+                del model
+            rows.append({
+                "model": name,
+                "version": current_version(name) or "legacy",
+                "mmap": mmap,
+                "load_ms": round(float(np.median(loads)) * 1000, 2),
+                "first_predict_ms": round(float(np.median(firsts)) * 1000, 2),
+                "ready_ms": round(float(np.median(np.add(loads, firsts))) * 1000, 2),
+            })
+    return pd.DataFrame(rows)
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["promote"] and len(args) == 3:
+        promote(args[1], args[2])
+    elif args[:1] == ["bench"]:
+        out = bench_startup()
+        STARTUP_REPORT.parent.mkdir(exist_ok=True)
+        out.to_csv(STARTUP_REPORT, index=False)
+        print(out.to_string(index=False))
+        print(f"✓ Saved startup benchmark: {STARTUP_REPORT}")
+    elif not args:
+        for name in LEGACY_PATHS:
+            current = current_version(name)
+            print(f"{name}: current={current or '(legacy file)'}")
+            for v in list_versions(name):
+                meta = load_meta(name, v)
+                print(f"  {'*' if v == current else ' '} {v}  dataset={meta['dataset']}  metrics={meta['metrics']}")
+    else:
+        raise SystemExit("usage: python -m src.modeling.registry [promote NAME VERSION | bench]")
+
+if __name__ == "__main__":
+    main()
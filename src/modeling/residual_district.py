@@ -1,31 +1,110 @@
 from __future__ import annotations
-import joblib
-import pandas as pd
+import os
+from functools import lru_cache
+from pathlib import Path
+import duckdb
 import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from joblib import Parallel, delayed
+
+from src.modeling.dataset import iter_batches, FEATURES, TARGET
+from src.modeling.feature_store import open_matrix
+from src.modeling.profiling import StageTimer
+from src.modeling.registry import load_model
+
+load_dotenv()
+
+# Residual scoring (make residual): the dataset is streamed in BATCH_ROWS chunks, each chunk is
+# predicted in a worker process, and per-transaction residuals are appended to
+# mart.transaction_residuals. District and district x month aggregates are then built in SQL
+# (sql/ddl/008_model_residuals_duckdb.sql). When the feature store has the encoded matrix,
+# workers read memmap slices of it and skip pre.transform.
+
+BATCH_ROWS = 500_000
+N_JOBS = int(os.getenv("RESIDUAL_N_JOBS", "-1"))
+MIN_DISTRICT_N = 200   # districts below this are kept in the mart but left out of the CSV ranking
+
+ID_COLS = ["year", "month", "county", "district", "property_type"]
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+@lru_cache(maxsize=1)
+def _model():
+    # loaded once per worker process, not shipped with every chunk
+    return load_model("hgbr")
+
+def _predict(X, encoded: bool) -> np.ndarray:
+    model = _model()
+    if encoded:
+        return model.named_steps["model"].predict(np.asarray(X))
+    return model.predict(X)
+
+def _chunks(X_enc=None):
+    """(row_offset, frame, X) per chunk; X is the matching feature-store slice or the raw features."""
+    cols = ID_COLS + [TARGET] if X_enc is not None else list(dict.fromkeys(ID_COLS + FEATURES + [TARGET]))
+    offset = 0
+    for df in iter_batches(columns=cols, batch_rows=BATCH_ROWS):
+        X = X_enc[offset:offset + len(df)] if X_enc is not None else df[FEATURES]
+        yield offset, df, X
+        offset += len(df)
 
 def main():
-    df = pd.read_parquet("data/processed/model_dataset.parquet")
+    model = _model()
+    stored = open_matrix("hgbr", model.named_steps["pre"])
+    X_enc = stored[0] if stored is not None else None
+    encoded = X_enc is not None
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.execute("""
+        CREATE OR REPLACE TABLE mart.transaction_residuals (
+          row_id BIGINT, year SMALLINT, month TINYINT, county VARCHAR, district VARCHAR,
+          property_type VARCHAR, log_price FLOAT, pred_log_price FLOAT, residual FLOAT
+        );
+    """)
 
-    y = df["log_price"].astype(float)
-    X = df[
-        ["year", "month", "quarter",
-         "property_type", "is_new_build", "duration", "is_freehold",
-         "district", "county"]
-    ].copy()
+    timer = StageTimer("residual")
+    chunks = _chunks(X_enc)
+    pending = []
 
-    model = joblib.load("models/hgbr_price_model.joblib")
-    y_pred = model.predict(X)
+    def _feed():
+        # keep each chunk's frame on this side; workers only receive the features
+        for offset, df, X in chunks:
+            pending.append((offset, df))
+            yield delayed(_predict)(X, encoded)
 
-    df2 = df.copy()
-    df2["residual"] = y - y_pred  # positive => actual higher than predicted
+    try:
+        for pred in Parallel(n_jobs=N_JOBS, return_as="generator")(_feed()):
+            offset, df = pending.pop(0)
+            out = df[ID_COLS].copy()
+            for c in ["county", "district", "property_type"]:
+                out[c] = out[c].astype(str)
+            out.insert(0, "row_id", np.arange(offset, offset + len(df), dtype=np.int64))
+            out["log_price"] = df[TARGET].to_numpy(dtype=np.float32)
+            out["pred_log_price"] = pred.astype(np.float32)
+            out["residual"] = out["log_price"] - out["pred_log_price"]  # positive => actual higher than predicted
+            con.register("_chunk", out)
+            con.execute("INSERT INTO mart.transaction_residuals SELECT * FROM _chunk")
+            con.unregister("_chunk")
+            timer.add(len(out))
 
-    by_district = (df2.groupby(["county","district"])
-                     .agg(n=("residual","count"), mean_residual=("residual","mean"))
-                     .query("n >= 200")  # adjust threshold
-                     .sort_values("mean_residual", ascending=False))
+        con.execute(Path("sql/ddl/008_model_residuals_duckdb.sql").read_text(encoding="utf-8"))
+        by_district = con.execute(f"""
+            SELECT county, district, n, mean_residual
+            FROM mart.district_residuals
+            WHERE n >= {MIN_DISTRICT_N}
+            ORDER BY mean_residual DESC
+        """).fetchdf()
+    finally:
+        con.close()
+    timer.report()
 
+    by_district = by_district.set_index(["county", "district"])
     by_district.to_csv("reports/district_residual_ranking.csv")
     print(by_district.head(20).to_string())
+    print("✓ Saved mart.transaction_residuals, mart.district_residuals, mart.district_month_residuals")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,224 @@
+from __future__ import annotations
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+from src.modeling.dataset import price_from_log, FEATURES, NUM_FEATURES, CAT_FEATURES
+from src.modeling.registry import load_model
+
+# Local pricing server around the saved models (make serve).
+#
+#   POST /predict   {"model": "hgbr"|"ridge", "records": [{feature: value, ...}, ...]}
+#                   (a single record object is accepted too) -> {"prices": [...], "log_prices": [...]}
+#   GET  /metrics   request latency p50/p99, batch sizes, throughput
+#   GET  /health
+#
+# Both models are loaded once. Handler threads never call predict themselves: they enqueue
+# their records and wait, while one batcher thread per model drains the queue into a single
+# vectorized predict of up to MAX_BATCH rows, waiting at most MAX_WAIT_MS for a batch to fill.
+# Records are type-checked before they are queued (bad input is a 400 for that request only);
+# if a merged predict still fails, each request in the batch is retried on its own.
+
+HOST = os.getenv("PRICE_SERVER_HOST", "127.0.0.1")
+PORT = int(os.getenv("PRICE_SERVER_PORT", "8765"))
+MAX_BATCH = int(os.getenv("PRICE_SERVER_MAX_BATCH", "256"))
+MAX_WAIT_MS = float(os.getenv("PRICE_SERVER_MAX_WAIT_MS", "2"))
+LATENCY_WINDOW = 10_000    # most recent requests kept for the percentiles
+
+MODEL_NAMES = ["hgbr", "ridge"]
+INT_RANGES = {"month": (1, 12), "quarter": (1, 4), "is_new_build": (0, 1), "is_freehold": (0, 1)}
+
+class MicroBatcher:
+    """Collects concurrent requests for one model and scores them in vectorized batches."""
+
+    def __init__(self, model, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue: queue.Queue = queue.Queue()
+        self.batch_sizes: deque = deque(maxlen=LATENCY_WINDOW)
+        self.predict_seconds = 0.0
+        self.rows = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, records: list[dict]) -> Future:
+        fut: Future = Future()
+        self.queue.put((records, fut))
+        return fut
+
+    def _collect(self) -> list:
+        pending = [self.queue.get()]
+        n = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n += len(item[0])
+        return pending
+
+    def _predict(self, records: list[dict]) -> np.ndarray:
+        t0 = time.perf_counter()
+        log_price = self.model.predict(pd.DataFrame.from_records(records, columns=FEATURES))
+        self.predict_seconds += time.perf_counter() - t0
+        self.batch_sizes.append(len(records))
+        self.rows += len(records)
+        return log_price
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            records = [r for recs, _ in pending for r in recs]
+            try:
+                log_price = self._predict(records)
+            except Exception:
+                # something in the merged batch broke predict: retry each request alone so
+                # only the request that caused it fails
+                for recs, fut in pending:
+                    try:
+                        fut.set_result(self._predict(recs))
+                    except Exception as exc:
+                        fut.set_exception(exc)
+                continue
+            i = 0
+            for recs, fut in pending:
+                fut.set_result(log_price[i:i + len(recs)])
+                i += len(recs)
+
+def _as_int(name: str, value) -> int:
+    """Integers, integral floats and digit strings ("2024"); anything else is a ValueError."""
+    try:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        out = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+    lo, hi = INT_RANGES.get(name, (None, None))
+    if lo is not None and not lo <= out <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}, got {out}")
+    return out
+
+def _normalize(record: dict) -> dict:
+    """Validate one record and coerce it to the dtypes the models were trained on."""
+    if not isinstance(record, dict):
+        raise ValueError(f"each record must be an object, got {type(record).__name__}")
+    if "quarter" not in record and "month" in record:
+        record = {**record, "quarter": (_as_int("month", record["month"]) - 1) // 3 + 1}
+    missing = [f for f in FEATURES if f not in record]
+    if missing:
+        raise ValueError(f"missing features: {', '.join(missing)}")
+    out = {f: _as_int(f, record[f]) for f in NUM_FEATURES}
+    for f in CAT_FEATURES:
+        if not isinstance(record[f], str):
+            raise ValueError(f"{f} must be a string, got {record[f]!r}")
+        out[f] = record[f]
+    return out
+
+class PricingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        super().__init__(address, PricingHandler)
+        self.batchers = {
+            name: MicroBatcher(load_model(name), max_batch, max_wait_ms)
+            for name in MODEL_NAMES
+        }
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.perf_counter()
+        self.requests = 0
+
+    def metrics(self) -> dict:
+        lat = np.asarray(self.latencies, dtype=float) * 1000
+        uptime = time.perf_counter() - self.started
+        out = {
+            "requests": self.requests,
+            "uptime_s": round(uptime, 1),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3) if lat.size else None,
+            "latency_ms_p99": round(float(np.percentile(lat, 99)), 3) if lat.size else None,
+            "models": {},
+        }
+        for name, b in self.batchers.items():
+            sizes = np.asarray(b.batch_sizes, dtype=float)
+            out["models"][name] = {
+                "rows": b.rows,
+                "batches": len(sizes),
+                "mean_batch_size": round(float(sizes.mean()), 1) if sizes.size else None,
+                "max_batch_size": int(sizes.max()) if sizes.size else None,
+                "predict_rows_per_s": round(b.rows / b.predict_seconds, 1) if b.predict_seconds else None,
+            }
+        return out
+
+class PricingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so load tests measure scoring rather than connects
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "models": list(self.server.batchers)})
+        elif self.path == "/metrics":
+            self._send(200, self.server.metrics())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send(404, {"error": "not found"})
+            return
+        t0 = time.perf_counter()
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            records = payload.get("records", [payload]) if isinstance(payload, dict) else payload
+            records = [_normalize(r) for r in records]
+            if not records:
+                raise ValueError("no records")
+            batcher = self.server.batchers[payload.get("model", "hgbr") if isinstance(payload, dict) else "hgbr"]
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        try:
+            log_price = batcher.submit(records).result()
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+            return
+        self.server.latencies.append(time.perf_counter() - t0)
+        self.server.requests += 1
+        self._send(200, {
+            "prices": [round(float(p), 2) for p in price_from_log(log_price)],
+            "log_prices": [float(p) for p in log_price],
+        })
+
+def main():
+    server = PricingServer((HOST, PORT))
+    print(f"✓ Pricing server on http://{HOST}:{server.server_address[1]} "
+          f"(max_batch={MAX_BATCH}, max_wait={MAX_WAIT_MS}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
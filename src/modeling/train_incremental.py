@@ -0,0 +1,196 @@
+from __future__ import annotations
+import json
+import os
+import time
+from pathlib import Path
+import numpy as np
+
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+from sklearn.pipeline import Pipeline
+from sklearn.linear_model import SGDRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from src.modeling.dataset import (
+    iter_batches, iter_shuffled_batches, distinct_values, latest_month, stratified_sample,
+    load_dataset, is_holdout,
+    FEATURES, NUM_FEATURES, CAT_FEATURES, TARGET,
+)
+from src.modeling.boosting import AdditiveBoostedRegressor
+from src.modeling.profiling import StageTimer
+from src.modeling.registry import load_model, model_exists, register
+from src.modeling.train_price_model import regression_metrics
+
+# Out-of-core training mode for the price models (make train_incremental).
+#
+# First run (no state file): the linear model streams the whole dataset with SGD partial_fit,
+# row groups in random order and rows shuffled inside them (the file is sorted by month, and
+# under a decaying learning rate a time-ordered stream would weight the oldest years most);
+# HGBR is fitted on a bounded county x year stratified sample.
+# Later runs only read months newer than models/incremental_state.json: the linear model
+# takes shuffled partial_fit steps on them, and HGBR is either
+#   "warm_start" (default) kept, plus NEW_TREES fitted on the residuals of a bounded sample of
+#                the new months: cost scales with the new months only, but corrections pile
+#                up, so after MAX_UPDATES of them the next run re-bases with a full sample fit
+#   "sample"     refitted on a fresh HGBR_SAMPLE_ROWS stratified sample of the whole history:
+#                every update costs a full fit, but the model never drifts from a clean fit
+# Memory is bounded by BATCH_ROWS / HGBR_SAMPLE_ROWS, not by history length.
+
+STATE_PATH = Path("models/incremental_state.json")
+
+BATCH_ROWS = 500_000
+EPOCHS = 2
+HOLDOUT_EVERY = 5          # full runs hold out every 5th row of the file for evaluation
+HGBR_SAMPLE_ROWS = 2_000_000
+NEW_TREES = 50
+MAX_UPDATES = 12           # warm-start corrections kept before HGBR is refitted from a sample
+HGBR_MODE = os.getenv("HGBR_INCREMENTAL_MODE", "warm_start")  # "warm_start" | "sample"
+
+def linear_pipeline(categories: dict[str, list]) -> Pipeline:
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), NUM_FEATURES),
+            ("cat", OneHotEncoder(categories=[categories[c] for c in CAT_FEATURES],
+                                  handle_unknown="ignore", sparse_output=True), CAT_FEATURES),
+        ],
+        remainder="drop"
+    )
+    # L2-penalized squared loss: the streaming counterpart of the Ridge baseline
+    model = SGDRegressor(penalty="l2", alpha=1e-6, learning_rate="invscaling", eta0=0.01,
+                         random_state=42)
+    return Pipeline(steps=[("pre", pre), ("model", model)])
+
+def hgbr_pipeline(categories: dict[str, list]) -> Pipeline:
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", NUM_FEATURES),
+            ("cat", OrdinalEncoder(categories=[categories[c] for c in CAT_FEATURES],
+                                   handle_unknown="use_encoded_value", unknown_value=-1), CAT_FEATURES),
+        ],
+        remainder="drop"
+    )
+    model = HistGradientBoostingRegressor(max_depth=6, learning_rate=0.05, max_iter=300, random_state=42)
+    return Pipeline(steps=[("pre", pre), ("model", model)])
+
+def fit_linear(ridge: Pipeline, since: tuple[int, int] | None, epochs: int, holdout: bool) -> None:
+    pre = ridge.named_steps["pre"]
+    sgd = ridge.named_steps["model"]
+    timer = StageTimer("incremental:linear")
+    for epoch in range(epochs):
+        for df in iter_shuffled_batches(columns=FEATURES + [TARGET], seed=42 + epoch, since=since,
+                                        batch_rows=BATCH_ROWS, row_numbers=holdout):
+            if holdout:
+                # same rows as is_holdout / stratified_sample: file positions that are multiples of k
+                df = df[df["file_row_number"].to_numpy() % HOLDOUT_EVERY != 0]
+            sgd.partial_fit(pre.transform(df[FEATURES]), df[TARGET].to_numpy(dtype=float))
+            timer.add(len(df))
+    timer.report()
+
+def fit_hgbr_sample(categories: dict[str, list], holdout: bool) -> Pipeline:
+    timer = StageTimer("incremental:hgbr_sample")
+    df = stratified_sample(FEATURES + [TARGET], ["county", "year"], HGBR_SAMPLE_ROWS,
+                           holdout_every=HOLDOUT_EVERY if holdout else None)
+    gbr = hgbr_pipeline(categories)
+    gbr.fit(df[FEATURES], df[TARGET].astype(float), model__sample_weight=df["sample_weight"].to_numpy())
+    timer.add(len(df))
+    timer.report()
+    return gbr
+
+def n_updates(gbr: Pipeline) -> int:
+    booster = gbr.named_steps["model"]
+    return len(booster.updates_) if isinstance(booster, AdditiveBoostedRegressor) else 0
+
+def fit_hgbr_warm_start(gbr: Pipeline, since: tuple[int, int]) -> Pipeline:
+    timer = StageTimer("incremental:hgbr_warm_start")
+    # reservoir sample inside the scan: a long gap between runs still loads at most HGBR_SAMPLE_ROWS
+    new = load_dataset(columns=FEATURES + [TARGET], since=since, sample_rows=HGBR_SAMPLE_ROWS)
+    pre = gbr.named_steps["pre"]
+    booster = gbr.named_steps["model"]
+    X_new = pre.transform(new[FEATURES])
+    residual = new[TARGET].to_numpy(dtype=float) - booster.predict(X_new)
+
+    update = HistGradientBoostingRegressor(max_depth=6, learning_rate=0.05, max_iter=NEW_TREES,
+                                           random_state=42)
+    update.fit(X_new, residual)
+    if isinstance(booster, AdditiveBoostedRegressor):
+        booster = AdditiveBoostedRegressor.from_fitted(booster.base_, booster.updates_ + [update])
+    else:
+        booster = AdditiveBoostedRegressor.from_fitted(booster, [update])
+    timer.add(len(new))
+    timer.report()
+    return Pipeline(steps=[("pre", pre), ("model", booster)])
+
+def evaluate(ridge: Pipeline, gbr: Pipeline, since: tuple[int, int] | None, holdout: bool, label: str) -> dict:
+    y_true, p_ridge, p_gbr = [], [], []
+    offset = 0
+    for df in iter_batches(columns=FEATURES + [TARGET], batch_rows=BATCH_ROWS, since=since):
+        if holdout:
+            mask = is_holdout(offset, len(df), HOLDOUT_EVERY)
+            offset += len(df)
+            df = df[mask]
+        y_true.append(df[TARGET].to_numpy(dtype=float))
+        p_ridge.append(ridge.predict(df[FEATURES]))
+        p_gbr.append(gbr.predict(df[FEATURES]))
+    if not y_true:
+        return {}
+    y = np.concatenate(y_true)
+    return {
+        "ridge": regression_metrics(y, np.concatenate(p_ridge), label=f"SGD-Ridge(log_price) {label}"),
+        "hgbr": regression_metrics(y, np.concatenate(p_gbr), label=f"HGBR(log_price) {label}"),
+    }
+
+def main():
+    t0 = time.perf_counter()
+    through = latest_month()
+    state = json.loads(STATE_PATH.read_text(encoding="utf-8")) if STATE_PATH.exists() else None
+    update = state is not None and model_exists("ridge") and model_exists("hgbr")
+
+    if update:
+        since = tuple(state["trained_through"])
+        if through <= since:
+            print(f"✓ Models already trained through {since[0]}-{since[1]:02d}; nothing new.")
+            return
+        print(f"Incremental update with months after {since[0]}-{since[1]:02d}")
+        # fully loaded (no mmap): SGD partial_fit updates the coefficients in place
+        ridge = load_model("ridge", mmap=False)
+        gbr = load_model("hgbr", mmap=False)
+
+        # How well did the previous models price the months they never saw?
+        metrics = evaluate(ridge, gbr, since, holdout=False, label="on new months (before update)")
+
+        fit_linear(ridge, since, epochs=1, holdout=False)
+        hgbr_mode = HGBR_MODE
+        if hgbr_mode == "warm_start" and n_updates(gbr) >= MAX_UPDATES:
+            print(f"HGBR has {MAX_UPDATES} warm-start corrections; refitting from a sample")
+            hgbr_mode = "sample"
+        if hgbr_mode == "warm_start":
+            gbr = fit_hgbr_warm_start(gbr, since)
+        else:
+            gbr = fit_hgbr_sample(distinct_values(CAT_FEATURES), holdout=False)
+    else:
+        print("Full out-of-core training run")
+        hgbr_mode = "sample"
+        categories = distinct_values(CAT_FEATURES)
+        ridge = linear_pipeline(categories)
+        # scaler statistics and encoder layout from a small sample; coefficients from the stream
+        ridge.named_steps["pre"].fit(load_dataset(columns=FEATURES, sample_rows=100_000))
+        fit_linear(ridge, None, epochs=EPOCHS, holdout=True)
+        gbr = fit_hgbr_sample(categories, holdout=True)
+        metrics = evaluate(ridge, gbr, None, holdout=True, label="on holdout")
+
+    notes = (f"incremental {'update' if update else 'full'} run through {through[0]}-{through[1]:02d}, "
+             f"hgbr_mode={hgbr_mode}" + ("; metrics: previous version on the new months" if update else ""))
+    seconds = time.perf_counter() - t0
+    register("ridge", ridge, metrics=metrics.get("ridge"), train_seconds=seconds, notes=notes)
+    register("hgbr", gbr, metrics=metrics.get("hgbr"), train_seconds=seconds, notes=notes)
+    STATE_PATH.parent.mkdir(exist_ok=True)
+    STATE_PATH.write_text(json.dumps({
+        "trained_through": list(through),
+        "hgbr_mode": hgbr_mode,
+        "last_run": "update" if update else "full",
+        "seconds": round(time.perf_counter() - t0, 1),
+    }, indent=2), encoding="utf-8")
+    print(f"✓ Registered models trained through {through[0]}-{through[1]:02d}")
+
+if __name__ == "__main__":
+    main()
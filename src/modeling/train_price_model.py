@@ -1,17 +1,26 @@
 from __future__ import annotations
-from pathlib import Path
+import os
+import time
 import pandas as pd
 import numpy as np
 
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, TargetEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from sklearn.linear_model import Ridge
 from sklearn.ensemble import HistGradientBoostingRegressor
-import joblib
+
+from src.modeling.dataset import load_dataset, FEATURES, NUM_FEATURES, CAT_FEATURES, TARGET
+from src.modeling.encoders import HashingEncoder, HierarchicalTargetEncoder
+from src.modeling.registry import register
+
+RIDGE_ENCODERS = ["onehot", "target", "hashing", "hierarchical"]
+RIDGE_ENCODER = os.getenv("RIDGE_ENCODER", "onehot")
+RIDGE_HASH_WIDTH = int(os.getenv("RIDGE_HASH_WIDTH", "256"))  # columns for RIDGE_ENCODER=hashing
+LOCATION_FEATURES = ["district", "county"]
 
 def regression_metrics(y_true, y_pred, label=""):
     mae = mean_absolute_error(y_true, y_pred)
@@ -20,37 +29,66 @@ def regression_metrics(y_true, y_pred, label=""):
     print(f"{label} MAE={mae:.4f} RMSE={rmse:.4f} R2={r2:.4f}")
     return {"mae": mae, "rmse": rmse, "r2": r2}
 
-def main():
-    df = pd.read_parquet("data/processed/model_dataset.parquet")
-
-    # Target is log_price
-    y = df["log_price"].astype(float)
-
-    # Features
-    X = df[
-        ["year", "month", "quarter",
-         "property_type", "is_new_build", "duration", "is_freehold",
-         "district", "county"]
-    ].copy()
-
-    num_features = ["year", "month", "quarter", "is_new_build", "is_freehold"]
-    cat_features = ["property_type", "duration", "district", "county"]
-
-    pre_ridge = ColumnTransformer(
-        transformers=[
-            ("num", "passthrough", num_features),
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=True), cat_features),
-        ],
-        remainder="drop"
-    )
+def _location_encoder(encoder: str, hash_width: int, shrinkage: float):
+    if encoder == "target":
+        # out-of-fold (cross-fitted) target means with empirical-Bayes smoothing
+        return TargetEncoder(target_type="continuous", cv=KFold(5, shuffle=True, random_state=42))
+    if encoder == "hashing":
+        return HashingEncoder(n_features=hash_width)
+    if encoder == "hierarchical":
+        return HierarchicalTargetEncoder(parent="county", child="district", shrinkage=shrinkage)
+    raise ValueError(f"unknown ridge encoder {encoder!r}; expected one of {RIDGE_ENCODERS}")
+
+def ridge_pipeline(alpha: float = 2.0, encoder: str = "onehot", hash_width: int = 256,
+                   shrinkage: float = 50.0) -> Pipeline:
+    # Baseline: Ridge (interpretable linear hedonic-ish model)
+    if encoder == "onehot":
+        transformers = [
+            ("num", "passthrough", NUM_FEATURES),
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=True), CAT_FEATURES),
+        ]
+    else:
+        # district/county get a compact encoding; the low-cardinality categoricals stay one-hot
+        low_card = [c for c in CAT_FEATURES if c not in LOCATION_FEATURES]
+        transformers = [
+            ("num", "passthrough", NUM_FEATURES),
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=True), low_card),
+            ("loc", _location_encoder(encoder, hash_width, shrinkage), LOCATION_FEATURES),
+        ]
+    pre_ridge = ColumnTransformer(transformers=transformers, remainder="drop")
+    return Pipeline(steps=[
+        ("pre", pre_ridge),
+        ("model", Ridge(alpha=alpha, random_state=42))
+    ])
 
+def hgbr_pipeline(max_depth: int = 6, learning_rate: float = 0.05, max_iter: int = 300, **params) -> Pipeline:
+    # ML: Gradient boosting (stronger non-linear model)
     pre_gbr = ColumnTransformer(
         transformers=[
-            ("num", "passthrough", num_features),
-            ("cat", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1), cat_features),
+            ("num", "passthrough", NUM_FEATURES),
+            ("cat", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1), CAT_FEATURES),
         ],
         remainder="drop"
     )
+    return Pipeline(steps=[
+        ("pre", pre_gbr),
+        ("model", HistGradientBoostingRegressor(
+            max_depth=max_depth,
+            learning_rate=learning_rate,
+            max_iter=max_iter,
+            random_state=42,
+            **params
+        ))
+    ])
+
+def main():
+    df = load_dataset(columns=FEATURES + [TARGET])
+
+    # Target is log_price
+    y = df[TARGET].astype(float)
+
+    # Features
+    X = df[FEATURES]
 
     # Split (holdout test)
     X_train, X_test, y_train, y_test = train_test_split(
@@ -58,34 +96,28 @@ def main():
     )
 
     # 1) Baseline: Ridge (interpretable linear hedonic-ish model)
-    ridge = Pipeline(steps=[
-        ("pre", pre_ridge),
-        ("model", Ridge(alpha=2.0, random_state=42))
-    ])
+    ridge = ridge_pipeline(encoder=RIDGE_ENCODER, hash_width=RIDGE_HASH_WIDTH)
 
+    t0 = time.perf_counter()
     ridge.fit(X_train, y_train)
+    ridge_seconds = time.perf_counter() - t0
     pred_ridge = ridge.predict(X_test)
-    regression_metrics(y_test, pred_ridge, label="Ridge(log_price)")
+    ridge_metrics = regression_metrics(y_test, pred_ridge, label="Ridge(log_price)")
 
     # 2) ML: Gradient boosting (stronger non-linear model)
-    gbr = Pipeline(steps=[
-        ("pre", pre_gbr),
-        ("model", HistGradientBoostingRegressor(
-            max_depth=6,
-            learning_rate=0.05,
-            max_iter=300,
-            random_state=42
-        ))
-    ])
+    gbr = hgbr_pipeline()
 
+    t0 = time.perf_counter()
     gbr.fit(X_train, y_train)
+    gbr_seconds = time.perf_counter() - t0
     pred_gbr = gbr.predict(X_test)
-    regression_metrics(y_test, pred_gbr, label="HGBR(log_price)")
+    gbr_metrics = regression_metrics(y_test, pred_gbr, label="HGBR(log_price)")
 
-    Path("models").mkdir(exist_ok=True)
-    joblib.dump(ridge, "models/ridge_price_model.joblib")
-    joblib.dump(gbr, "models/hgbr_price_model.joblib")
-    print("✓ Saved models to /models")
+    notes = "random 80/20 holdout"
+    encoder_notes = f"encoder={RIDGE_ENCODER}" + (f", hash_width={RIDGE_HASH_WIDTH}" if RIDGE_ENCODER == "hashing" else "")
+    register("ridge", ridge, metrics=ridge_metrics, train_seconds=ridge_seconds, n_train=len(X_train),
+             notes=f"{notes}, {encoder_notes}")
+    register("hgbr", gbr, metrics=gbr_metrics, train_seconds=gbr_seconds, n_train=len(X_train), notes=notes)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os
+from math import factorial
+import numpy as np
+from joblib import Parallel, delayed
+
+# Exact path-dependent TreeSHAP for fitted HistGradientBoosting models, in numpy.
+#
+# Each leaf is a product game over the distinct features D on its root-to-leaf path:
+#   f_leaf(S) = value * prod_{j in D} (o_j(x) if j in S else z_j)
+# where z_j is the share of training rows sent down the path at j's splits (node counts) and
+# o_j(x) is 1 if x satisfies every split on j along the path. The Shapley values of that game
+# depend on x only through the 2^|D| patterns of o, so each leaf gets a (2^|D|, |D|) table at
+# compile time, and explaining rows is a bit-pattern lookup per leaf, vectorized over rows.
+# Summed over leaves and trees this is the same quantity as TreeSHAP (Lundberg et al. 2020).
+
+N_JOBS = int(os.getenv("SHAP_N_JOBS", "-1"))
+# Leaf tables are (2^d, d) for d distinct features on the path, so d is capped: with the
+# ordinal encoding d <= n_features (9 for the price models) regardless of tree depth.
+MAX_PATH_FEATURES = int(os.getenv("SHAP_MAX_PATH_FEATURES", "12"))
+CHUNK_ROWS = 50_000
+
+def _boosters(model) -> list:
+    """HGBR estimators inside a model; AdditiveBoostedRegressor contributes its updates too."""
+    if hasattr(model, "base_") and hasattr(model, "updates_"):
+        return [model.base_] + list(model.updates_)
+    return [model]
+
+def _leaf_table(value: float, z: np.ndarray) -> np.ndarray:
+    d = len(z)
+    patterns = ((np.arange(2 ** d)[:, None] >> np.arange(d)) & 1).astype(np.float64)
+    weights = np.array([factorial(s) * factorial(d - s - 1) / factorial(d) for s in range(d)])
+    table = np.empty((2 ** d, d))
+    for k in range(d):
+        # coefficients of prod_{j != k} (z_j + o_j t): coefficient s sums the subsets of size s
+        poly = np.zeros((2 ** d, d))
+        poly[:, 0] = 1.0
+        for j in range(d):
+            if j == k:
+                continue
+            shifted = np.zeros_like(poly)
+            shifted[:, 1:] = poly[:, :-1] * patterns[:, [j]]
+            poly = poly * z[j] + shifted
+        table[:, k] = value * (patterns[:, k] - z[k]) * (poly @ weights)
+    return table
+
+def _compile_tree(nodes: np.ndarray) -> tuple[list, float]:
+    """Leaves of one tree as (features, lo, hi, nan_ok, table), plus its expected value."""
+    if nodes["is_categorical"].any():
+        raise ValueError("native categorical splits are not supported; encode categoricals as ordinals")
+    leaves, expected = [], 0.0
+    # path state: feature -> [lo, hi, nan_ok, z]; x on the path iff lo < x <= hi
+    stack = [(0, {})]
+    while stack:
+        i, path = stack.pop()
+        node = nodes[i]
+        if node["is_leaf"]:
+            feats = np.array(sorted(path), dtype=np.intp)
+            if len(feats) > MAX_PATH_FEATURES:
+                raise ValueError(
+                    f"a leaf path splits on {len(feats)} distinct features, above "
+                    f"SHAP_MAX_PATH_FEATURES={MAX_PATH_FEATURES} (leaf tables are 2^d x d)"
+                )
+            state = np.array([path[f] for f in feats], dtype=np.float64).reshape(-1, 4)
+            z = state[:, 3]
+            expected += float(node["value"] * np.prod(z))
+            if len(feats):
+                leaves.append((feats, state[:, 0], state[:, 1], state[:, 2].astype(bool),
+                               _leaf_table(float(node["value"]), z)))
+            continue
+        f, thr, go_left = int(node["feature_idx"]), float(node["num_threshold"]), bool(node["missing_go_to_left"])
+        for child, left in ((int(node["left"]), True), (int(node["right"]), False)):
+            lo, hi, nan_ok, z = path.get(f, (-np.inf, np.inf, True, 1.0))
+            child_path = dict(path)
+            child_path[f] = (
+                lo if left else max(lo, thr),
+                min(hi, thr) if left else hi,
+                nan_ok and (go_left if left else not go_left),
+                z * nodes[child]["count"] / node["count"],
+            )
+            stack.append((child, child_path))
+    return leaves, expected
+
+class TreeShap:
+    """Compiled TreeSHAP tables for a fitted HistGradientBoostingRegressor."""
+
+    def __init__(self, model):
+        self.leaves = []
+        self.expected_value = 0.0
+        for booster in _boosters(model):
+            if booster.n_trees_per_iteration_ != 1:
+                raise ValueError("only single-output regressors are supported")
+            self.expected_value += float(np.ravel(booster._baseline_prediction)[0])
+            for predictors in booster._predictors:
+                leaves, expected = _compile_tree(predictors[0].nodes)
+                self.leaves += leaves
+                self.expected_value += expected
+        self.n_features = _boosters(model)[0].n_features_in_
+
+    def _explain_chunk(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        cols = [np.ascontiguousarray(X[:, j]) for j in range(X.shape[1])]
+        nan_cols = {j for j, c in enumerate(cols) if np.isnan(c).any()}
+        phi = np.zeros(X.shape, dtype=np.float64)
+        for feats, lo, hi, nan_ok, table in self.leaves:
+            bits = np.zeros(X.shape[0], dtype=np.intp)
+            for k, f in enumerate(feats):
+                inside = (cols[f] > lo[k]) & (cols[f] <= hi[k])
+                if f in nan_cols:
+                    inside = np.where(np.isnan(cols[f]), nan_ok[k], inside)
+                bits |= inside.astype(np.intp) << k
+            phi[:, feats] += table[bits]
+        return phi
+
+    def shap_values(self, X, n_jobs: int = N_JOBS, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+        """(n_rows, n_features) attributions; each row sums to predict(x) - expected_value."""
+        X = np.asarray(X)
+        # every feature is discrete here, so identical encoded rows share one explanation
+        uniq, inverse = np.unique(X, axis=0, return_inverse=True)
+        parts = Parallel(n_jobs=n_jobs)(
+            delayed(self._explain_chunk)(uniq[i:i + chunk_rows]) for i in range(0, len(uniq), chunk_rows)
+        )
+        return np.concatenate(parts)[np.ravel(inverse)] if parts else np.zeros(X.shape)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import itertools
+import math
+import os
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, parallel_config
+
+from src.modeling.dataset import load_dataset, FEATURES, TARGET
+from src.modeling.profiling import StageTimer
+from src.modeling.train_price_model import ridge_pipeline, hgbr_pipeline, regression_metrics
+
+# Time-aware evaluation and budgeted hyperparameter search (make tune).
+#
+# Folds are rolling origins over (year, month): each fold trains on every month before its
+# origin and tests on the HORIZON_MONTHS after it, so no fold ever sees future prices.
+# Candidates go through successive halving: rung 0 fits every config on MIN_TRAIN_ROWS rows
+# per fold, each later rung keeps the best 1/ETA configs per model and gives them ETA times
+# more rows. (config x fold) fits run in parallel; a rung is only started if it is expected
+# to finish inside BUDGET_SECONDS, and no fit starts once the budget is spent: the rung is cut
+# short and the configs that finished every fold are kept. Every rung lands in
+# reports/model_leaderboard.csv.
+
+LEADERBOARD_PATH = Path("reports/model_leaderboard.csv")
+
+MAX_ROWS = int(os.getenv("TUNE_MAX_ROWS", "2000000"))
+N_FOLDS = 3
+HORIZON_MONTHS = 12
+MIN_TRAIN_ROWS = 50_000
+ETA = 3
+BUDGET_SECONDS = float(os.getenv("TUNE_BUDGET_SECONDS", "1800"))
+N_JOBS = int(os.getenv("TUNE_N_JOBS", "-1"))
+
+BUILDERS = {"ridge": ridge_pipeline, "hgbr": hgbr_pipeline}
+
+def _grid(**axes) -> list[dict]:
+    return [dict(zip(axes, values)) for values in itertools.product(*axes.values())]
+
+CANDIDATES = {
+    "ridge": _grid(alpha=[0.1, 2.0, 50.0], encoder=["onehot", "target", "hierarchical"]),
+    "hgbr": _grid(max_depth=[4, 6, 8, 10], learning_rate=[0.05, 0.1],
+                  max_iter=[300], min_samples_leaf=[20, 100]),
+}
+
+def rolling_origin_folds(period: np.ndarray, n_folds: int = N_FOLDS,
+                         horizon: int = HORIZON_MONTHS) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    (train_idx, test_idx) per fold, oldest origin first. `period` is year * 12 + month - 1;
+    the last fold tests on the final `horizon` months, earlier folds step back one horizon each.
+    """
+    last = int(period.max())
+    folds = []
+    for k in range(n_folds, 0, -1):
+        origin = last - k * horizon + 1
+        train = np.flatnonzero(period < origin)
+        test = np.flatnonzero((period >= origin) & (period < origin + horizon))
+        if len(train) and len(test):
+            folds.append((train, test))
+    return folds
+
+def config_label(params: dict) -> str:
+    return " ".join(f"{k}={v}" for k, v in params.items())
+
+def _fit_and_score(model: str, params: dict, X: pd.DataFrame, y: np.ndarray,
+                   train_idx: np.ndarray, test_idx: np.ndarray, deadline: float) -> dict | None:
+    # deadline is wall-clock (time.time) so it means the same thing in every worker process
+    if time.time() > deadline:
+        return None
+    pipe = BUILDERS[model](**params)
+    t0 = time.perf_counter()
+    pipe.fit(X.iloc[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pred = pipe.predict(X.iloc[test_idx])
+    predict_s = time.perf_counter() - t0
+    scores = regression_metrics(y[test_idx], pred, label=f"{model}[{config_label(params)}] n={len(train_idx):,}")
+    return {**scores, "fit_s": fit_s, "predict_s": predict_s, "n_test": len(test_idx)}
+
+def _summarize(model: str, params: dict, rung: int, n_train: int, results: list[dict]) -> dict:
+    r = pd.DataFrame(results)
+    return {
+        "model": model,
+        "config": config_label(params),
+        "rung": rung,
+        "n_train": n_train,
+        "folds": len(r),
+        "mae_mean": r["mae"].mean(),
+        "mae_std": r["mae"].std(ddof=0),
+        "rmse_mean": r["rmse"].mean(),
+        "rmse_std": r["rmse"].std(ddof=0),
+        "r2_mean": r["r2"].mean(),
+        "fit_s_mean": r["fit_s"].mean(),
+        "predict_s_mean": r["predict_s"].mean(),
+        "predict_rows_per_s": r["n_test"].sum() / max(r["predict_s"].sum(), 1e-9),
+    }
+
+def successive_halving(X: pd.DataFrame, y: np.ndarray,
+                       folds: list[tuple[np.ndarray, np.ndarray]]) -> pd.DataFrame:
+    t_start = time.perf_counter()
+    deadline = time.time() + BUDGET_SECONDS
+    max_train = max(len(tr) for tr, _ in folds)
+    alive = {m: list(cfgs) for m, cfgs in CANDIDATES.items()}
+    rows = []
+    rung, last_rung_s = 0, 0.0
+
+    while any(alive.values()):
+        n_train = min(MIN_TRAIN_ROWS * ETA ** rung, max_train)
+        elapsed = time.perf_counter() - t_start
+        # worst case for the next rung: ETA x more rows per fit with no fewer configs
+        if rung and elapsed + last_rung_s * ETA > BUDGET_SECONDS:
+            print(f"⏱ Budget reached after {elapsed:.0f}s; stopping before rung {rung}")
+            break
+
+        timer = StageTimer(f"tune:rung{rung}")
+        # X is pre-shuffled, so the first n train rows of a fold are a random subset and each
+        # rung's subset contains the previous one
+        jobs = [(m, p, tr[:n_train], te) for m, cfgs in alive.items() for p in cfgs for tr, te in folds]
+        results = Parallel(n_jobs=N_JOBS)(
+            delayed(_fit_and_score)(m, p, X, y, tr, te, deadline) for m, p, tr, te in jobs
+        )
+        timer.add(sum(len(tr) for (_, _, tr, _), res in zip(jobs, results) if res is not None))
+        last_rung_s = timer.report()["seconds"]
+
+        by_config: dict[tuple, list] = {}
+        for (m, p, _, _), res in zip(jobs, results):
+            if res is not None:
+                by_config.setdefault((m, config_label(p)), []).append(res)
+        # a config only ranks once it has been scored on every fold
+        rung_rows = [
+            _summarize(m, p, rung, n_train, by_config[(m, config_label(p))])
+            for m, cfgs in alive.items() for p in cfgs
+            if len(by_config.get((m, config_label(p)), [])) == len(folds)
+        ]
+        rows += rung_rows
+
+        if any(res is None for res in results):
+            print(f"⏱ Budget reached during rung {rung}; kept {len(rung_rows)} fully scored configs")
+            break
+        if n_train >= max_train:
+            break
+        ranked = pd.DataFrame(rung_rows).sort_values("rmse_mean")
+        for m, cfgs in alive.items():
+            keep = math.ceil(len(cfgs) / ETA)
+            survivors = ranked.loc[ranked["model"] == m, "config"].head(keep).tolist()
+            alive[m] = [p for p in cfgs if config_label(p) in survivors]
+        rung += 1
+
+    return pd.DataFrame(rows)
+
+def main():
+    timer = StageTimer("tune:load")
+    df = load_dataset(columns=FEATURES + [TARGET], sample_rows=MAX_ROWS)
+    df = df.sample(frac=1.0, random_state=42).reset_index(drop=True)
+    timer.add(len(df))
+    timer.report()
+
+    X = df[FEATURES]
+    y = df[TARGET].to_numpy(dtype=float)
+    period = df["year"].to_numpy(dtype=np.int32) * 12 + df["month"].to_numpy(dtype=np.int32) - 1
+    folds = rolling_origin_folds(period)
+    if not folds:
+        raise SystemExit("Not enough months in the dataset for rolling-origin folds.")
+    for i, (tr, te) in enumerate(folds):
+        first = int(period[te].min())
+        print(f"Fold {i}: train {len(tr):,} rows, test {len(te):,} rows from {first // 12}-{first % 12 + 1:02d}")
+
+    # the boosters are multi-threaded themselves; give each parallel worker a single thread
+    with parallel_config(backend="loky", inner_max_num_threads=1):
+        board = successive_halving(X, y, folds)
+    if board.empty:
+        print("⏱ Budget spent before any config was scored on every fold; raise TUNE_BUDGET_SECONDS")
+        return
+
+    board = board.sort_values(["model", "rung", "rmse_mean"], ascending=[True, False, True])
+    LEADERBOARD_PATH.parent.mkdir(exist_ok=True)
+    board.to_csv(LEADERBOARD_PATH, index=False)
+    print(f"✓ Saved leaderboard: {LEADERBOARD_PATH}")
+    for model, g in board.groupby("model", sort=False):
+        best = g.iloc[0]
+        print(f"Best {model}: {best['config']} (rung {best['rung']}, n_train={best['n_train']:,}) "
+              f"RMSE={best['rmse_mean']:.4f}±{best['rmse_std']:.4f} MAE={best['mae_mean']:.4f}")
+
+if __name__ == "__main__":
+    main()
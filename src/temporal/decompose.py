@@ -0,0 +1,132 @@
+from __future__ import annotations
+import os
+import time
+import warnings
+from pathlib import Path
+import duckdb
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from joblib import Parallel, delayed, parallel_config
+from statsmodels.tsa.seasonal import STL
+
+from src.modeling.forecast_batch import load_panel, TARGETS, SEASON
+
+load_dotenv()
+
+# Trend / seasonal / residual decomposition of every national, county and district monthly
+# series (make decompose), the per-region counterpart of mart.seasonality_month.
+#
+#   DECOMPOSE_METHOD=stl  (default) robust STL per series, chunks of SERIES_CHUNK across a pool
+#   DECOMPOSE_METHOD=ma   classical additive decomposition for the whole panel at once:
+#                         centred 2x12 moving-average trend, month-of-year means of the
+#                         detrended series (centred to sum to zero), residual = rest
+# Leading months before a series' first sale are left out (NaN components). Components go to
+# mart.decomposition; mart.decomposition_strength has the trend / seasonal strength per series
+# (1 - Var(resid) / Var(component + resid), Wang, Smith & Hyndman 2006).
+
+METHOD = os.getenv("DECOMPOSE_METHOD", "stl")
+SERIES_CHUNK = 32
+N_JOBS = int(os.getenv("DECOMPOSE_N_JOBS", "-1"))
+
+def db_path() -> str:
+    return os.getenv("DUCKDB_PATH", "data/uk_ppd.duckdb")
+
+def stl_chunk(Y: np.ndarray, period: int = SEASON) -> np.ndarray:
+    """Robust STL for each row of Y; returns (3, rows, months) trend / seasonal / resid."""
+    out = np.full((3,) + Y.shape, np.nan)
+    for i, y in enumerate(Y):
+        start = int(np.argmax(~np.isnan(y)))
+        obs = y[start:]
+        if len(obs) < 2 * period or np.isnan(obs).any():
+            continue
+        res = STL(obs, period=period, robust=True).fit()
+        out[:, i, start:] = res.trend, res.seasonal, res.resid
+    return out
+
+def stl_panel(Y: np.ndarray, period: int = SEASON, n_jobs: int = N_JOBS) -> np.ndarray:
+    chunks = [slice(i, i + SERIES_CHUNK) for i in range(0, len(Y), SERIES_CHUNK)]
+    with parallel_config(backend="loky", inner_max_num_threads=1):
+        parts = Parallel(n_jobs=n_jobs)(delayed(stl_chunk)(Y[rows], period) for rows in chunks)
+    return np.concatenate(parts, axis=1)
+
+def ma_panel(Y: np.ndarray, period: int = SEASON) -> np.ndarray:
+    """Classical additive decomposition of every row at once; (3, rows, months)."""
+    Y = np.asarray(Y, dtype=float)
+    # centred 2 x period moving average (period even): weights 1/2p at the ends, 1/p inside
+    w = np.r_[0.5, np.ones(period - 1), 0.5] / period
+    half = period // 2
+    windows = np.lib.stride_tricks.sliding_window_view(Y, len(w), axis=1)
+    trend = np.full_like(Y, np.nan)
+    trend[:, half:Y.shape[1] - half] = windows @ w        # NaN anywhere in the window -> NaN
+
+    detrended = Y - trend
+    n_cycles = -(-Y.shape[1] // period)
+    padded = np.full((len(Y), n_cycles * period), np.nan)
+    padded[:, :Y.shape[1]] = detrended
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # series too short for a month-of-year mean
+        profile = np.nanmean(padded.reshape(len(Y), n_cycles, period), axis=1)
+    profile -= np.nanmean(profile, axis=1, keepdims=True)
+    seasonal = np.tile(profile, n_cycles)[:, :Y.shape[1]]
+    seasonal[np.isnan(Y)] = np.nan
+    return np.stack([trend, seasonal, Y - trend - seasonal])
+
+def strength(components: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    trend, seasonal, resid = components
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        var_r = np.nanvar(resid, axis=1)
+        f_trend = np.maximum(0.0, 1 - var_r / np.nanvar(trend + resid, axis=1))
+        f_season = np.maximum(0.0, 1 - var_r / np.nanvar(seasonal + resid, axis=1))
+    return f_trend, f_season
+
+DECOMPOSERS = {"stl": stl_panel, "ma": ma_panel}
+
+def main():
+    con = duckdb.connect(db_path())
+    series, panels = load_panel(con)
+    con.close()
+    months = panels[TARGETS[0]].index
+    n, T = len(series), len(months)
+
+    parts, strengths = [], []
+    for target in TARGETS:
+        Y = panels[target].to_numpy(dtype=float).T
+        t0 = time.perf_counter()
+        comp = DECOMPOSERS[METHOD](Y)
+        secs = time.perf_counter() - t0
+        print(f"[decompose:{METHOD}:{target}] {n:,} series x {T} months in {secs:.2f}s")
+
+        parts.append(pd.DataFrame({
+            "level": np.repeat(series["level"].to_numpy(), T),
+            "county": np.repeat(series["county"].to_numpy(), T),
+            "district": np.repeat(series["district"].to_numpy(), T),
+            "target": target,
+            "month": np.tile(months.to_numpy(), n),
+            "observed": Y.ravel(),
+            "trend": comp[0].ravel(),
+            "seasonal": comp[1].ravel(),
+            "resid": comp[2].ravel(),
+        }))
+        f_trend, f_season = strength(comp)
+        strengths.append(series[["level", "county", "district"]].assign(
+            target=target, trend_strength=f_trend, seasonal_strength=f_season))
+
+    out = pd.concat(parts, ignore_index=True).assign(method=METHOD)
+    strength_df = pd.concat(strengths, ignore_index=True).assign(method=METHOD)
+    print(strength_df.groupby(["target", "level"])[["trend_strength", "seasonal_strength"]].mean().round(3).to_string())
+
+    con = duckdb.connect(db_path())
+    con.execute("CREATE SCHEMA IF NOT EXISTS mart;")
+    con.register("df_dec", out)
+    con.execute("DROP TABLE IF EXISTS mart.decomposition;")
+    con.execute("CREATE TABLE mart.decomposition AS SELECT * FROM df_dec;")
+    con.register("df_str", strength_df)
+    con.execute("DROP TABLE IF EXISTS mart.decomposition_strength;")
+    con.execute("CREATE TABLE mart.decomposition_strength AS SELECT * FROM df_str;")
+    con.close()
+    print(f"✓ Wrote mart.decomposition ({len(out):,} rows) and mart.decomposition_strength")
+
+if __name__ == "__main__":
+    main()
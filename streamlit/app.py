@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
 from pathlib import Path
 
+from disk_cache import DiskCache
+from downsample import downsample_frame, points_for_width, x_positions
+from perf import PerfRecorder, cache_body
+from table_view import lazy_csv, search_rows, table_page
+
 st.set_page_config(
     page_title="UK Real Estate Intelligence",
     page_icon="🏠",
@@ -13,6 +20,26 @@ st.set_page_config(
 EXPORT_DIR = Path("/Users/yachidarji/Documents/DriveY/Project/UK analysis/streamlit/bi_exports")
 STYLE_PATH = Path("/Users/yachidarji/Documents/DriveY/Project/UK analysis/streamlit/assets/style.css")
 
+# Shared across all dashboard processes (replicas) on this host
+CACHE_DIR = Path(os.getenv("DASHBOARD_CACHE_DIR", str(EXPORT_DIR.parent / ".cache")))
+
+@st.cache_resource(show_spinner=False)
+def get_disk_cache() -> DiskCache:
+    # one instance per process: this script reruns on every interaction and in every session,
+    # and the hit/miss counters, lock and tracked cache size must outlive a single run
+    return DiskCache(
+        EXPORT_DIR,
+        CACHE_DIR,
+        max_bytes=int(os.getenv("DASHBOARD_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    )
+
+DISK_CACHE = get_disk_cache()
+
+PERF_LOG = Path(os.getenv("DASHBOARD_PERF_LOG", str(EXPORT_DIR.parent / "logs" / "perf.jsonl")))
+if "perf" not in st.session_state:
+    st.session_state["perf"] = PerfRecorder(PERF_LOG)
+perf = st.session_state["perf"]
+
 # ---------- Property Type Mapping ----------
 TYPE_MAP = {
     "F": "Flat / Maisonette (F)",
@@ -35,6 +62,7 @@ def map_property_type(df: pd.DataFrame, col: str = "property_type") -> pd.DataFr
 
 # ---------- Loaders ----------
 @st.cache_data(show_spinner=False)
+@DISK_CACHE.cached
 def load_csv(name: str) -> pd.DataFrame:
     path = EXPORT_DIR / name
     if not path.exists():
@@ -42,6 +70,7 @@ def load_csv(name: str) -> pd.DataFrame:
     return pd.read_csv(path)
 
 @st.cache_data(show_spinner=False)
+@cache_body
 def load_all() -> dict[str, pd.DataFrame]:
     names = [
         "mart_kpi_overall.csv",
@@ -68,8 +97,14 @@ def load_all() -> dict[str, pd.DataFrame]:
         "mart_monthly_by_county.csv",
         "mart_county_growth_yoy.csv",
         "mart_district_growth_yoy.csv",
+        "mart_monthly_kpi_aggregates.csv",
+        "mart_monthly_price_sketch.csv",
+        "mart_forecast_backtest_metrics.csv",
     ]
-    return {n: load_csv(n) for n in names}
+    data = {n: load_csv(n) for n in names}
+    for n in ["mart_monthly_kpi_aggregates.csv", "mart_monthly_price_sketch.csv"]:
+        data[n] = ensure_month(data[n])
+    return data
 
 # ---------- Styling ----------
 def apply_style():
@@ -83,6 +118,47 @@ def ensure_month(df: pd.DataFrame, col: str = "month") -> pd.DataFrame:
     out[col] = pd.to_datetime(out[col], errors="coerce")
     return out
 
+# ---------- KPI rollup (from mergeable monthly aggregates) ----------
+SKETCH_GAMMA = 1.02 / 0.98  # must match mart.monthly_price_sketch
+
+def sketch_quantile(sketch: pd.DataFrame, q: float) -> float | None:
+    """
+    Approximate quantile from log-bucket counts summed over any set of months.
+    Returns the bucket midpoint, which is within ~2% of the true value.
+    """
+    if sketch is None or sketch.empty:
+        return None
+    counts = sketch.groupby("bucket")["n"].sum().sort_index()
+    total = counts.sum()
+    if total == 0:
+        return None
+    rank = q * (total - 1)
+    bucket = counts.index[(counts.cumsum() > rank).argmax()]
+    return 2 * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)
+
+def kpis_for_range(aggs: pd.DataFrame, sketch: pd.DataFrame) -> dict:
+    """
+    Recompute headline KPIs for the (already date-filtered) monthly aggregate rows.
+    Returns an empty dict when the aggregate exports are not available.
+    """
+    if aggs is None or aggs.empty or "n" not in aggs.columns:
+        return {}
+    n = float(aggs["n"].sum())
+    if n == 0:
+        return {}
+    total = float(aggs["sum_price"].sum())
+    mean = total / n
+    var = max(float(aggs["sum_price_sq"].sum()) / n - mean ** 2, 0.0)
+    return {
+        "transactions": int(n),
+        "total_revenue": total,
+        "avg_price": mean,
+        "std_price": var ** 0.5,
+        "median_price": sketch_quantile(sketch, 0.5),
+        "new_build_rate": float(aggs["n_new_build"].sum()) / n,
+        "freehold_rate": float(aggs["n_freehold"].sum()) / n,
+    }
+
 def fmt_currency(x) -> str:
     try:
         return f"£{float(x):,.0f}"
@@ -131,6 +207,7 @@ def sidebar_glossary():
     )
 
 # ---------- App ----------
+perf.begin("Home")
 apply_style()
 
 st.title("UK Real Estate Intelligence")
@@ -143,7 +220,8 @@ if not EXPORT_DIR.exists():
     st.error("Missing folder `bi_exports/`. Create it and place your exported CSVs inside.")
     st.stop()
 
-data = load_all()
+data = perf.cached_call("load_all", load_all)
+perf.record_frames(data)
 
 st.sidebar.header("Global Filters")
 
@@ -166,18 +244,53 @@ def filter_by_date(df: pd.DataFrame, month_col: str = "month") -> pd.DataFrame:
     if df is None or df.empty or date_range is None or month_col not in df.columns:
         return df
     start, end = date_range
-    out = df.copy()
-    out[month_col] = pd.to_datetime(out[month_col], errors="coerce")
-    return out[(out[month_col] >= pd.to_datetime(start)) & (out[month_col] <= pd.to_datetime(end))]
+    with perf.timer("filter", f"filter_by_date ({len(df):,} rows)"):
+        out = df.copy()
+        out[month_col] = pd.to_datetime(out[month_col], errors="coerce")
+        return out[(out[month_col] >= pd.to_datetime(start)) & (out[month_col] <= pd.to_datetime(end))]
+
+# The setting lives under a plain session_state key (widget keys are dropped on pages that do
+# not render the widget) and downsample_for_chart reads it on every call, from any page.
+st.session_state.setdefault("full_resolution", False)
+
+def _store_full_resolution():
+    st.session_state["full_resolution"] = st.session_state["_full_resolution_toggle"]
+
+st.sidebar.toggle(
+    "Full-resolution charts",
+    value=st.session_state["full_resolution"],
+    key="_full_resolution_toggle",
+    on_change=_store_full_resolution,
+    help="Off: long time series are downsampled (shape-preserving) to what the chart width can show.",
+)
+
+def downsample_for_chart(df: pd.DataFrame, x: str, y: str, color: str | None = None, width_px: int = 1200) -> pd.DataFrame:
+    if df is None or df.empty:
+        return df
+    if st.session_state.get("full_resolution", False):
+        return df.iloc[np.argsort(x_positions(df[x]), kind="stable")] if x in df.columns else df
+    with perf.timer("downsample", f"{y} ({len(df):,} rows)"):
+        return downsample_frame(df, x, y, max_points=points_for_width(width_px), color=color)
 
 # Sidebar glossary
 sidebar_glossary()
 
+with st.sidebar.expander("Shared cache"):
+    st.json(DISK_CACHE.stats())
+
 # Store for pages
 st.session_state["DATA"] = data
 st.session_state["filter_by_date"] = filter_by_date
 st.session_state["fmt_currency"] = fmt_currency
 st.session_state["fmt_pct"] = fmt_pct
 st.session_state["map_property_type"] = map_property_type
+st.session_state["kpis_for_range"] = kpis_for_range
+st.session_state["disk_cache"] = DISK_CACHE
+st.session_state["downsample_for_chart"] = downsample_for_chart
+st.session_state["search_rows"] = search_rows
+st.session_state["table_page"] = table_page
+st.session_state["lazy_csv"] = lazy_csv
+
+st.success("Data loaded. Use the Pages menu (left sidebar) to navigate.")
 
-st.success("Data loaded. Use the Pages menu (left sidebar) to navigate.")
\ No newline at end of file
+perf.end(DISK_CACHE.stats())
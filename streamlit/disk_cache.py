@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Shared on-disk cache for the dashboard.
+# Every Streamlit replica on the same host (or sharing the same volume) reads and writes
+# the same cache directory, so an export is parsed / a view is computed once for all of them.
+# Entries are keyed by (function, export manifest hash, arguments): re-exporting any CSV
+# changes the manifest hash, which invalidates every entry without an explicit purge.
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Full directory scans (eviction, entry counts) only run every EVICT_EVERY puts, or sooner when
+# this process's running size estimate passes max_bytes; other replicas' writes are picked up then.
+EVICT_EVERY = 50
+
+def _hash_arg(h, value) -> None:
+    if isinstance(value, pd.DataFrame):
+        h.update(b"df")
+        h.update(repr(list(value.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        h.update(b"series")
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(f"seq{len(value)}".encode("utf-8"))
+        for v in value:
+            _hash_arg(h, v)
+    elif isinstance(value, dict):
+        h.update(f"map{len(value)}".encode("utf-8"))
+        for k in sorted(value, key=repr):
+            _hash_arg(h, k)
+            _hash_arg(h, value[k])
+    else:
+        h.update(repr(value).encode("utf-8"))
+
+class DiskCache:
+    def __init__(self, export_dir: Path, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.export_dir = Path(export_dir)
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Streamlit sessions are threads of one process: counters and the size estimate are shared
+        self._lock = threading.Lock()
+        self._size_bytes: int | None = None
+        self._n_entries = 0
+        self._puts_since_scan = 0
+
+    def manifest_hash(self) -> str:
+        """
+        Fingerprint of the export folder (file names, sizes and mtimes).
+        Cheap enough to recompute per call: it only stats the files.
+        """
+        h = hashlib.sha256()
+        if self.export_dir.exists():
+            for p in sorted(self.export_dir.glob("*.csv")):
+                st = p.stat()
+                h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def key(self, name: str, args: tuple, kwargs: dict) -> str:
+        h = hashlib.sha256()
+        h.update(name.encode("utf-8"))
+        h.update(self.manifest_hash().encode("utf-8"))
+        _hash_arg(h, args)
+        _hash_arg(h, kwargs)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None, False
+        except Exception:
+            # truncated, foreign or written by other library versions: drop it and recompute
+            path.unlink(missing_ok=True)
+            return None, False
+        try:
+            # mtime doubles as the LRU timestamp
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value, True
+
+    def put(self, key: str, value) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # unique temp file per writer: concurrent misses on one key never share a temp file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            # an entry replaced by this put (concurrent misses on one key) is not new space
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = None
+            # atomic on POSIX: concurrent readers see either the old entry or the new one
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._puts_since_scan += 1
+            if self._size_bytes is not None:
+                self._size_bytes += size - (old_size or 0)
+                self._n_entries += old_size is None
+            scan = (self._size_bytes is None or self._size_bytes > self.max_bytes
+                    or self._puts_since_scan >= EVICT_EVERY)
+        if scan:
+            self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        out = []
+        if not self.cache_dir.exists():
+            return out
+        for p in self.cache_dir.glob("*/*.pkl"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def evict(self) -> None:
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        n, evicted = len(entries), 0
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            n -= 1
+        with self._lock:
+            self.evictions += evicted
+            self._size_bytes = total
+            self._n_entries = n
+            self._puts_since_scan = 0
+
+    def cached(self, fn):
+        """
+        Decorator: memoize fn on disk, shared across processes.
+        Arguments may be plain values or DataFrames (hashed by content).
+        """
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = self.key(name, args, kwargs)
+            value, hit = self.get(key)
+            with self._lock:
+                if hit:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            self.put(key, value)
+            return value
+
+        return wrapper
+
+    def stats(self) -> dict:
+        """Counters plus the tracked cache size; the directory is only scanned the first time."""
+        if self._size_bytes is None:
+            self.evict()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "entries": self._n_entries,
+                "size_mb": self._size_bytes / 1e6,
+                "max_mb": self.max_bytes / 1e6,
+            }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Server-side downsampling for line charts.
+# Largest-Triangle-Three-Buckets (LTTB) keeps the visual shape of a series (peaks, dips,
+# turning points) while capping how many points are serialized to the browser per trace.
+
+POINTS_PER_PX = 2  # more than this per trace is not visible on screen
+
+def points_for_width(width_px: int) -> int:
+    return max(int(width_px * POINTS_PER_PX), 3)
+
+def x_positions(xv: pd.Series) -> np.ndarray:
+    """
+    Float x for LTTB and sorting: numbers as is, datetimes (or strings that all parse as
+    dates, e.g. a CSV month column) as int64 nanoseconds, anything else by position.
+    """
+    if pd.api.types.is_numeric_dtype(xv) and not pd.api.types.is_bool_dtype(xv):
+        return xv.to_numpy(dtype=float)
+    if not pd.api.types.is_datetime64_any_dtype(xv):
+        parsed = pd.to_datetime(xv, errors="coerce", utc=True)
+        if parsed.notna().all():
+            xv = parsed
+    if pd.api.types.is_datetime64_any_dtype(xv):
+        return xv.astype("int64").to_numpy(dtype=float)
+    return np.arange(len(xv), dtype=float)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points LTTB selects from (x, y); x must be sorted ascending.
+    First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+        else:
+            nxt = slice(n - 1, n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def downsample_frame(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    max_points: int,
+    color: str | None = None,
+) -> pd.DataFrame:
+    """
+    Downsample each trace (one per value of `color`) of a long-format frame to at most
+    max_points rows. Rows with a missing x or y are dropped; other columns are kept.
+    """
+    if df is None or df.empty or x not in df.columns or y not in df.columns:
+        return df
+
+    def one(trace: pd.DataFrame) -> pd.DataFrame:
+        trace = trace.dropna(subset=[x, y])
+        # sort on the numeric key: mixed string / datetime x (CSV months next to parsed ones)
+        # cannot be compared directly
+        xv = x_positions(trace[x])
+        order = np.argsort(xv, kind="stable")
+        trace, xv = trace.iloc[order], xv[order]
+        if len(trace) <= max_points:
+            return trace
+        idx = lttb_indices(xv, pd.to_numeric(trace[y], errors="coerce").to_numpy(dtype=float), max_points)
+        return trace.iloc[idx]
+
+    if color is None or color not in df.columns:
+        return one(df)
+    parts = [one(g) for _, g in df.groupby(color, sort=False, observed=True)]
+    return pd.concat(parts, ignore_index=True) if parts else df.iloc[0:0]
@@ -5,6 +5,9 @@ DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Start Here")
 
 st.header("Start Here: What this dashboard is and how to use it")
 
@@ -142,4 +145,7 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+perf.record_frames({"monthly": monthly, "county_kpis": county_kpis, "type_kpis": type_kpis})
+perf.end(disk_cache.stats())
@@ -6,52 +6,87 @@ DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+kpis_for_range = st.session_state["kpis_for_range"]
+downsample_for_chart = st.session_state["downsample_for_chart"]
+lazy_csv = st.session_state["lazy_csv"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Executive Overview")
 
 st.header("Executive Overview")
 
 kpi = DATA.get("mart_kpi_overall.csv", pd.DataFrame())
 monthly = filter_by_date(DATA.get("mart_monthly_kpis.csv", pd.DataFrame()))
 
-# KPI strip
-if not kpi.empty:
+# KPI strip: recomputed for the selected date range when the monthly aggregates are exported;
+# only when they are not exported does it fall back to the all-history mart_kpi_overall.csv
+all_aggs = DATA.get("mart_monthly_kpi_aggregates.csv", pd.DataFrame())
+have_aggs = not all_aggs.empty and "n" in all_aggs.columns
+row, empty_range = {}, False
+aggs = sketch = None
+if have_aggs:
+    aggs = filter_by_date(all_aggs)
+    sketch = filter_by_date(DATA.get("mart_monthly_price_sketch.csv", pd.DataFrame()))
+    with perf.timer("groupby", "kpis_for_range"):
+        row = kpis_for_range(aggs, sketch)
+    empty_range = not row
+elif not kpi.empty:
     row = kpi.iloc[0].to_dict()
+
+if empty_range:
+    st.info("No transactions in the selected date range.")
+elif row:
     c1, c2, c3, c4, c5 = st.columns(5)
     c1.metric("Transactions", f"{int(row.get('transactions', 0)):,}")
     c2.metric("Median Price", fmt_currency(row.get("median_price")))
     c3.metric("Total Revenue", fmt_currency(row.get("total_revenue")))
     c4.metric("New-build Share", fmt_pct(row.get("new_build_rate")))
     c5.metric("Freehold Share", fmt_pct(row.get("freehold_rate")))
+    if "std_price" in row:
+        st.caption(
+            f"KPIs for the selected date range. Average price {fmt_currency(row.get('avg_price'))} "
+            f"(std dev {fmt_currency(row.get('std_price'))}); median is approximate (±2%)."
+        )
+    else:
+        st.caption("All-history KPIs (mart_monthly_kpi_aggregates.csv not exported).")
 else:
     st.warning("Missing mart_kpi_overall.csv")
 
 st.markdown("---")
 
 # Trends
-if monthly.empty or "month" not in monthly.columns:
+if "month" not in DATA.get("mart_monthly_kpis.csv", pd.DataFrame()).columns:
     st.error("Missing mart_monthly_kpis.csv or invalid month column.")
     st.stop()
+if monthly.empty:
+    if not empty_range:  # already said above the KPI strip
+        st.info("No transactions in the selected date range.")
+    st.stop()
 
 col1, col2 = st.columns(2, gap="large")
 
 with col1:
     st.subheader("Median Price Trend")
-    fig = px.line(monthly.sort_values("month"), x="month", y="median_price")
-    fig.update_layout(height=360, margin=dict(l=10,r=10,t=30,b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Median Price Trend"):
+        fig = px.line(downsample_for_chart(monthly, "month", "median_price", width_px=600), x="month", y="median_price")
+        fig.update_layout(height=360, margin=dict(l=10,r=10,t=30,b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
 with col2:
     st.subheader("Sales Volume Trend")
-    fig = px.area(monthly.sort_values("month"), x="month", y="sales_volume")
-    fig.update_layout(height=360, margin=dict(l=10,r=10,t=30,b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Sales Volume Trend"):
+        fig = px.area(downsample_for_chart(monthly, "month", "sales_volume", width_px=600), x="month", y="sales_volume")
+        fig.update_layout(height=360, margin=dict(l=10,r=10,t=30,b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
 col3, col4 = st.columns([2, 1], gap="large")
 
 with col3:
     st.subheader("Total Revenue Trend")
-    fig = px.line(monthly.sort_values("month"), x="month", y="total_revenue")
-    fig.update_layout(height=320, margin=dict(l=10,r=10,t=30,b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Total Revenue Trend"):
+        fig = px.line(downsample_for_chart(monthly, "month", "total_revenue", width_px=800), x="month", y="total_revenue")
+        fig.update_layout(height=320, margin=dict(l=10,r=10,t=30,b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
 with col4:
     st.subheader("Latest Month Snapshot")
@@ -80,7 +115,10 @@ if len(m) >= 2:
 
 st.download_button(
     "Download: monthly_kpis.csv (filtered)",
-    data=monthly.to_csv(index=False).encode("utf-8"),
+    data=lazy_csv(monthly),
     file_name="monthly_kpis_filtered.csv",
     mime="text/csv"
-)
\ No newline at end of file
+)
+
+perf.record_frames({"kpi": kpi, "monthly": monthly, "aggs": aggs, "sketch": sketch})
+perf.end(disk_cache.stats())
@@ -7,6 +7,11 @@ DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+downsample_for_chart = st.session_state["downsample_for_chart"]
+lazy_csv = st.session_state["lazy_csv"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Market Cycles")
 
 st.header("Market Cycles & Seasonality")
 
@@ -78,10 +83,11 @@ with col1:
         st.warning("mart_monthly_kpis_yoy.csv missing.")
     else:
         yoy = yoy.sort_values("month")
-        fig = px.line(yoy, x="month", y="yoy_median_price")
-        fig.add_hline(y=0, line_dash="dash")
-        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "YoY Median Price Growth (best signal)"):
+            fig = px.line(downsample_for_chart(yoy, "month", "yoy_median_price", width_px=600), x="month", y="yoy_median_price")
+            fig.add_hline(y=0, line_dash="dash")
+            fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
 
 with col2:
     st.subheader("Seasonality: Sales Volume by Month-of-Year")
@@ -89,18 +95,20 @@ with col2:
         st.warning("mart_seasonality_month.csv missing.")
     else:
         season = season.sort_values("month_of_year")
-        fig = px.line(season, x="month_of_year", y="sales_volume")
-        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Seasonality: Sales Volume by Month-of-Year"):
+            fig = px.line(season, x="month_of_year", y="sales_volume")
+            fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
 
 st.subheader("Price Index (normalizes long-term trend)")
 if index_df.empty:
     st.info("mart_price_index_monthly.csv missing.")
 else:
     index_df = index_df.sort_values("month")
-    fig = px.line(index_df, x="month", y="median_price_index")
-    fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Price Index (normalizes long-term trend)"):
+        fig = px.line(downsample_for_chart(index_df, "month", "median_price_index"), x="month", y="median_price_index")
+        fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
 # -------------------------
 # Details (tables) moved to expander
@@ -111,7 +119,10 @@ with st.expander("See data details (for analysts)"):
         st.dataframe(yoy[cols].tail(24), use_container_width=True, hide_index=True)
         st.download_button(
             "Download YoY table (filtered)",
-            data=yoy.to_csv(index=False).encode("utf-8"),
+            data=lazy_csv(yoy),
             file_name="monthly_kpis_yoy_filtered.csv",
             mime="text/csv",
-        )
\ No newline at end of file
+        )
+
+perf.record_frames({"monthly": monthly, "yoy": yoy, "index_df": index_df, "season": season})
+perf.end(disk_cache.stats())
@@ -5,6 +5,11 @@ import pandas as pd
 DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
+downsample_for_chart = st.session_state["downsample_for_chart"]
+lazy_csv = st.session_state["lazy_csv"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Regional Performance")
 
 st.header("Regional Performance (Where to focus)")
 
@@ -63,10 +68,11 @@ left, right = st.columns(2, gap="large")
 with left:
     st.subheader("Top Counties by Sales Volume")
     top25 = county_kpis.sort_values("sales_volume", ascending=False).head(25)
-    fig = px.bar(top25, x="county", y="sales_volume")
-    fig.update_layout(height=380, margin=dict(l=10, r=10, t=30, b=10))
-    fig.update_xaxes(tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Top Counties by Sales Volume"):
+        fig = px.bar(top25, x="county", y="sales_volume")
+        fig.update_layout(height=380, margin=dict(l=10, r=10, t=30, b=10))
+        fig.update_xaxes(tickangle=-45)
+        st.plotly_chart(fig, use_container_width=True)
 
 with right:
     st.subheader("Risk/Volatility: Dispersion vs Price")
@@ -74,46 +80,53 @@ with right:
         st.warning("mart_county_dispersion.csv missing.")
     else:
         d = disp.sort_values("n_sales", ascending=False).head(60)
-        fig = px.scatter(
-            d,
-            x="iqr",
-            y="median_price",
-            size="n_sales",
-            hover_name="county",
-        )
-        fig.update_layout(height=380, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Risk/Volatility: Dispersion vs Price"):
+            fig = px.scatter(
+                d,
+                x="iqr",
+                y="median_price",
+                size="n_sales",
+                hover_name="county",
+            )
+            fig.update_layout(height=380, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
 
 # Drill into districts (chart + then details)
 st.subheader("District drilldown (inside selected county)")
 if selected_county and not district_kpis.empty and "county" in district_kpis.columns:
-    dsub = district_kpis[district_kpis["county"] == selected_county].copy()
-    dsub = dsub.sort_values("sales_volume", ascending=False)
+    with perf.timer("filter", "district drilldown"):
+        dsub = district_kpis[district_kpis["county"] == selected_county].copy()
+        dsub = dsub.sort_values("sales_volume", ascending=False)
 
     # Chart: top districts by volume
     topd = dsub.head(20)
-    fig = px.bar(topd, x="district", y="sales_volume", title=f"Top Districts by Sales Volume — {selected_county}")
-    fig.update_layout(height=360, margin=dict(l=10, r=10, t=40, b=10))
-    fig.update_xaxes(tickangle=-35)
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Top Districts by Sales Volume"):
+        fig = px.bar(topd, x="district", y="sales_volume", title=f"Top Districts by Sales Volume — {selected_county}")
+        fig.update_layout(height=360, margin=dict(l=10, r=10, t=40, b=10))
+        fig.update_xaxes(tickangle=-35)
+        st.plotly_chart(fig, use_container_width=True)
 
     # Optional YoY chart for county
     if not county_growth.empty and "county" in county_growth.columns and "yoy_median_price" in county_growth.columns:
         cg = county_growth[county_growth["county"] == selected_county].sort_values("month")
         if not cg.empty:
-            fig = px.line(cg, x="month", y="yoy_median_price", title=f"YoY Median Price Growth — {selected_county}")
-            fig.add_hline(y=0, line_dash="dash")
-            fig.update_layout(height=300, margin=dict(l=10, r=10, t=40, b=10))
-            st.plotly_chart(fig, use_container_width=True)
+            with perf.timer("figure", "County YoY Median Price Growth"):
+                fig = px.line(downsample_for_chart(cg, "month", "yoy_median_price"), x="month", y="yoy_median_price", title=f"YoY Median Price Growth — {selected_county}")
+                fig.add_hline(y=0, line_dash="dash")
+                fig.update_layout(height=300, margin=dict(l=10, r=10, t=40, b=10))
+                st.plotly_chart(fig, use_container_width=True)
 
     with st.expander("See district table (details)"):
         show_cols = [c for c in ["district","sales_volume","median_price","total_revenue"] if c in dsub.columns]
         st.dataframe(dsub[show_cols].head(60), use_container_width=True, hide_index=True)
         st.download_button(
             f"Download districts — {selected_county}",
-            data=dsub.to_csv(index=False).encode("utf-8"),
+            data=lazy_csv(dsub),
             file_name=f"districts_{selected_county}.csv".replace(" ", "_"),
             mime="text/csv",
         )
 else:
-    st.info("Pick a county to see district drilldown.")
\ No newline at end of file
+    st.info("Pick a county to see district drilldown.")
+
+perf.record_frames({"county_kpis": county_kpis, "district_kpis": district_kpis, "disp": disp, "county_growth": county_growth})
+perf.end(disk_cache.stats())
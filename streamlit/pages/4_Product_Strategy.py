@@ -6,9 +6,12 @@ DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+map_property_type = st.session_state["map_property_type"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Product Strategy")
 
 st.header("Product Strategy (Type, New-build, Tenure)")
-map_property_type = st.session_state["map_property_type"]
 
 types_ext = DATA.get("mart_property_type_kpis_extended.csv", pd.DataFrame())
 types_basic = DATA.get("mart_property_type_kpis.csv", pd.DataFrame())
@@ -61,15 +64,17 @@ if "property_type" in df.columns:
     show_cols = [c for c in ["property_type","sales_volume","median_price","avg_price","total_revenue","new_build_rate","freehold_rate","iqr"] if c in df.columns]
     st.dataframe(df[show_cols], use_container_width=True, hide_index=True)
 
-    fig = px.bar(df, x="property_type", y="sales_volume", title="Demand: Sales Volume by Property Type")
-    fig.update_layout(height=320, margin=dict(l=10, r=10, t=40, b=10))
-    st.plotly_chart(fig, use_container_width=True)
-
-    if "median_price" in df.columns:
-        fig = px.bar(df, x="property_type", y="median_price", title="Pricing: Median Price by Property Type")
+    with perf.timer("figure", "Demand: Sales Volume by Property Type"):
+        fig = px.bar(df, x="property_type", y="sales_volume", title="Demand: Sales Volume by Property Type")
         fig.update_layout(height=320, margin=dict(l=10, r=10, t=40, b=10))
         st.plotly_chart(fig, use_container_width=True)
 
+    if "median_price" in df.columns:
+        with perf.timer("figure", "Pricing: Median Price by Property Type"):
+            fig = px.bar(df, x="property_type", y="median_price", title="Pricing: Median Price by Property Type")
+            fig.update_layout(height=320, margin=dict(l=10, r=10, t=40, b=10))
+            st.plotly_chart(fig, use_container_width=True)
+
 st.markdown("---")
 
 c1, c2 = st.columns(2, gap="large")
@@ -81,9 +86,10 @@ with c1:
     else:
         nb_by_type = nb_by_type.sort_values("new_build_premium_pct", ascending=False)
         st.dataframe(nb_by_type, use_container_width=True, hide_index=True)
-        fig = px.bar(nb_by_type, x="property_type", y="new_build_premium_pct")
-        fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "New-build Premium by Type"):
+            fig = px.bar(nb_by_type, x="property_type", y="new_build_premium_pct")
+            fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
 
 with c2:
     st.subheader("Freehold Premium by Type")
@@ -92,9 +98,10 @@ with c2:
     else:
         ten_by_type = ten_by_type.sort_values("freehold_premium_pct", ascending=False)
         st.dataframe(ten_by_type, use_container_width=True, hide_index=True)
-        fig = px.bar(ten_by_type, x="property_type", y="freehold_premium_pct")
-        fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Freehold Premium by Type"):
+            fig = px.bar(ten_by_type, x="property_type", y="freehold_premium_pct")
+            fig.update_layout(height=320, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
 
 st.markdown(
     """
@@ -109,4 +116,7 @@ st.markdown(
 
 df = map_property_type(df)
 nb_by_type = map_property_type(nb_by_type)
-ten_by_type = map_property_type(ten_by_type)
\ No newline at end of file
+ten_by_type = map_property_type(ten_by_type)
+
+perf.record_frames({"types_ext": types_ext, "types_basic": types_basic, "nb_by_type": nb_by_type, "ten_by_type": ten_by_type})
+perf.end(disk_cache.stats())
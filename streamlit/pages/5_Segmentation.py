@@ -5,6 +5,12 @@ import pandas as pd
 DATA = st.session_state["DATA"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+disk_cache = st.session_state["disk_cache"]
+search_rows = st.session_state["search_rows"]
+table_page = st.session_state["table_page"]
+lazy_csv = st.session_state["lazy_csv"]
+perf = st.session_state["perf"]
+perf.begin("Segmentation")
 
 st.header("Segmentation (Groups of similar districts)")
 
@@ -37,6 +43,22 @@ view = seg.copy()
 if selected_seg != "All":
     view = view[view["district_segment"].astype(str) == selected_seg]
 
+# Shared across replicas: keyed by the export manifest + the filtered view
+@disk_cache.cached
+def segment_profile(view: pd.DataFrame) -> pd.DataFrame:
+    return (
+        view.groupby("district_segment")
+            .agg(
+                districts=("district", "count") if "district" in view.columns else ("county","count"),
+                median_price=("median_price", "mean"),
+                new_build_rate=("new_build_rate", "mean"),
+                freehold_rate=("freehold_rate", "mean") if "freehold_rate" in view.columns else ("new_build_rate", "mean"),
+                iqr_price=("iqr_price", "mean") if "iqr_price" in view.columns else ("median_price", "mean"),
+            )
+            .reset_index()
+            .sort_values("districts", ascending=False)
+    )
+
 # -------------------------
 # Key takeaways
 # -------------------------
@@ -75,38 +97,30 @@ with left:
     st.subheader("Segment map (pricing vs new-build rate)")
     req = {"median_price","new_build_rate","district_segment"}
     if req.issubset(set(seg.columns)):
-        fig = px.scatter(
-            view,
-            x="median_price",
-            y="new_build_rate",
-            color="district_segment",
-            size="n_sales" if "n_sales" in view.columns else None,
-            hover_data=[c for c in ["county","district","freehold_rate","iqr_price"] if c in view.columns],
-        )
-        fig.update_layout(height=430, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Segment map (pricing vs new-build rate)"):
+            fig = px.scatter(
+                view,
+                x="median_price",
+                y="new_build_rate",
+                color="district_segment",
+                size="n_sales" if "n_sales" in view.columns else None,
+                hover_data=[c for c in ["county","district","freehold_rate","iqr_price"] if c in view.columns],
+            )
+            fig.update_layout(height=430, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("Segmentation columns missing for scatter plot.")
 
 with right:
     st.subheader("Segment profile summary (easy comparison)")
-    prof = (
-        view.groupby("district_segment")
-            .agg(
-                districts=("district", "count") if "district" in view.columns else ("county","count"),
-                median_price=("median_price", "mean"),
-                new_build_rate=("new_build_rate", "mean"),
-                freehold_rate=("freehold_rate", "mean") if "freehold_rate" in view.columns else ("new_build_rate", "mean"),
-                iqr_price=("iqr_price", "mean") if "iqr_price" in view.columns else ("median_price", "mean"),
-            )
-            .reset_index()
-            .sort_values("districts", ascending=False)
-    )
+    with perf.timer("groupby", "segment_profile"):
+        prof = segment_profile(view)
     st.dataframe(prof, use_container_width=True, hide_index=True)
 
-    fig = px.bar(prof, x="district_segment", y="districts", title="How big is each segment?")
-    fig.update_layout(height=280, margin=dict(l=10, r=10, t=40, b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "How big is each segment?"):
+        fig = px.bar(prof, x="district_segment", y="districts", title="How big is each segment?")
+        fig.update_layout(height=280, margin=dict(l=10, r=10, t=40, b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
 st.markdown(
     """
@@ -127,11 +141,41 @@ with st.expander("See district list (details) + download"):
         "county","district","district_segment","n_sales","median_price","iqr_price",
         "new_build_rate","freehold_rate","share_flat","share_detached","share_terraced"
     ] if c in view.columns]
-    st.dataframe(view[show_cols].sort_values("n_sales", ascending=False).head(300), use_container_width=True, hide_index=True)
 
-    st.download_button(
+    f1, f2, f3, f4 = st.columns([2, 2, 1, 1])
+    query = f1.text_input("Search county / district", "")
+    sort_by = f2.selectbox(
+        "Sort by",
+        show_cols,
+        index=show_cols.index("n_sales") if "n_sales" in show_cols else 0,
+    )
+    ascending = f3.toggle("Ascending", value=False)
+    page_size = f4.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+    with perf.timer("filter", "district explorer search"):
+        matches = search_rows(view[show_cols], query, ["county", "district"])
+    n_pages = max((len(matches) + page_size - 1) // page_size, 1)
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+    with perf.timer("groupby", "district explorer page"):
+        page_rows, n_pages = table_page(matches, sort_by, ascending, page, page_size)
+    first = (page - 1) * page_size
+    st.caption(f"Rows {first + 1 if len(matches) else 0:,}–{first + len(page_rows):,} of {len(matches):,}")
+    st.dataframe(page_rows, use_container_width=True, hide_index=True)
+
+    d1, d2 = st.columns(2)
+    d1.download_button(
         "Download this district list (current view)",
-        data=view.to_csv(index=False).encode("utf-8"),
+        data=lazy_csv(view),
         file_name="district_segments_view.csv",
         mime="text/csv"
-    )
\ No newline at end of file
+    )
+    d2.download_button(
+        "Download search results",
+        data=lazy_csv(matches),
+        file_name="district_segments_search.csv",
+        mime="text/csv",
+        disabled=not query,
+    )
+
+perf.record_frames({"seg": seg})
+perf.end(disk_cache.stats())
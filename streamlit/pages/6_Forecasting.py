@@ -7,6 +7,10 @@ DATA = st.session_state["DATA"]
 filter_by_date = st.session_state["filter_by_date"]
 fmt_currency = st.session_state["fmt_currency"]
 fmt_pct = st.session_state["fmt_pct"]
+downsample_for_chart = st.session_state["downsample_for_chart"]
+perf = st.session_state["perf"]
+disk_cache = st.session_state["disk_cache"]
+perf.begin("Forecasting")
 
 st.header("Forecasting (SARIMAX)")
 
@@ -47,9 +51,10 @@ with c1:
         st.info("Missing reports/forecast_sales_volume.csv (run Task 9).")
     else:
         # Plot forecast
-        fig = px.line(f_sales.sort_values("month"), x="month", y="forecast_sales_volume")
-        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Sales Volume Forecast (Next 12 Months)"):
+            fig = px.line(f_sales.sort_values("month"), x="month", y="forecast_sales_volume")
+            fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
         st.dataframe(f_sales, use_container_width=True, hide_index=True)
 
 with c2:
@@ -57,9 +62,10 @@ with c2:
     if f_price.empty:
         st.info("Missing reports/forecast_median_price.csv (run Task 9).")
     else:
-        fig = px.line(f_price.sort_values("month"), x="month", y="forecast_median_price")
-        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+        with perf.timer("figure", "Median Price Forecast (Next 12 Months)"):
+            fig = px.line(f_price.sort_values("month"), x="month", y="forecast_median_price")
+            fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+            st.plotly_chart(fig, use_container_width=True)
         st.dataframe(f_price, use_container_width=True, hide_index=True)
 
 st.markdown("---")
@@ -68,6 +74,8 @@ st.markdown("---")
 st.subheader("Actual vs Forecast (Overlay)")
 if not monthly_actual.empty and not f_price.empty and "month" in monthly_actual.columns:
     actual = monthly_actual[["month","median_price"]].copy()
+    # unfiltered exports keep month as text; the forecast side is parsed by read_report_csv
+    actual["month"] = pd.to_datetime(actual["month"], errors="coerce")
     actual["series"] = "Actual"
 
     forecast = f_price[["month","forecast_median_price"]].copy()
@@ -75,12 +83,39 @@ if not monthly_actual.empty and not f_price.empty and "month" in monthly_actual.
     forecast["series"] = "Forecast"
 
     combined = pd.concat([actual, forecast], ignore_index=True)
-    fig = px.line(combined.sort_values("month"), x="month", y="median_price", color="series")
-    fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
-    st.plotly_chart(fig, use_container_width=True)
+    with perf.timer("figure", "Actual vs Forecast (Overlay)"):
+        fig = px.line(
+            downsample_for_chart(combined, "month", "median_price", color="series"),
+            x="month", y="median_price", color="series",
+        )
+        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+        st.plotly_chart(fig, use_container_width=True)
 else:
     st.info("Need both monthly actuals and forecast file to show overlay.")
 
+st.markdown("---")
+
+# Rolling-origin backtest (make backtest): metrics per model, series and horizon
+st.subheader("Rolling-Origin Backtest")
+bt = DATA.get("mart_forecast_backtest_metrics.csv", pd.DataFrame())
+if bt.empty:
+    st.info("Missing mart_forecast_backtest_metrics.csv (run make backtest, then make export).")
+else:
+    b1, b2, b3 = st.columns(3)
+    bt_target = b1.selectbox("Target", sorted(bt["target"].unique()))
+    bt_level = b2.selectbox("Level", [lv for lv in ["national", "county", "district"] if lv in set(bt["level"])])
+    bt_metric = b3.selectbox("Metric", ["mape", "smape", "mase", "mae", "rmse", "bias"])
+    sub = bt[(bt["target"] == bt_target) & (bt["level"] == bt_level)]
+    by_h = sub.groupby(["model", "horizon"], as_index=False)[bt_metric].mean()
+    with perf.timer("figure", "Backtest error by horizon"):
+        fig = px.line(by_h, x="horizon", y=bt_metric, color="model", markers=True)
+        fig.update_layout(height=360, margin=dict(l=10, r=10, t=30, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(
+        sub.groupby("model", as_index=False)[["mae", "rmse", "bias", "mape", "smape", "mase"]].mean(),
+        use_container_width=True, hide_index=True,
+    )
+
 st.markdown(
     """
     <div class="callout">
@@ -92,3 +127,5 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+perf.record_frames({"monthly_actual": monthly_actual, "f_sales": f_sales, "f_price": f_price, "bt": bt})
+perf.end(disk_cache.stats())
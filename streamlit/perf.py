@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+# Lightweight instrumentation for the dashboard.
+# One PerfRecorder lives in st.session_state for the whole browser session; each page calls
+# begin() at the top and end() at the bottom. Every timed stage (load / filter / groupby /
+# figure) is shown in the optional sidebar "Performance" panel and appended to a JSONL log
+# so slow pages can be analysed offline across sessions and replicas.
+# st.cache_data hits are detected with cache_body/cached_call: the cached body flags that it ran,
+# so a call that returns without the flag set was served from the cache.
+
+_body = threading.local()
+
+def cache_body(fn):
+    """Put under @st.cache_data so PerfRecorder.cached_call can tell hits from misses."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _body.ran = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+class PerfRecorder:
+    def __init__(self, log_path: Path):
+        self.log_path = Path(log_path)
+        self.session_id = uuid.uuid4().hex[:12]
+        self.page = None
+        self.events: list[dict] = []
+        self.frame_sizes: dict[str, float] = {}
+        self.cache_data_hits = 0
+        self.cache_data_misses = 0
+        self._t0 = None
+
+    def begin(self, page: str) -> None:
+        # A page that called st.stop() never reached end(); log what it did record
+        if self._t0 is not None:
+            self._flush(None)
+        self.page = page
+        self.events = []
+        self.frame_sizes = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def timer(self, kind: str, label: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append({
+                "kind": kind,
+                "label": label,
+                "ms": (time.perf_counter() - t) * 1000,
+            })
+
+    def cached_call(self, label: str, fn, *args, **kwargs):
+        """Time an st.cache_data function (wrapped with cache_body) and record hit or miss."""
+        _body.ran = False
+        t = time.perf_counter()
+        out = fn(*args, **kwargs)
+        hit = not _body.ran
+        if hit:
+            self.cache_data_hits += 1
+        else:
+            self.cache_data_misses += 1
+        self.events.append({
+            "kind": "load",
+            "label": label,
+            "ms": (time.perf_counter() - t) * 1000,
+            "cache": "hit" if hit else "miss",
+        })
+        return out
+
+    def record_frames(self, data: dict[str, pd.DataFrame]) -> None:
+        """In-memory size (MB) of the frames this page run works with (after filters)."""
+        sizes = {
+            name: float(df.memory_usage(deep=True).sum()) / 1e6 if df is not None and not df.empty else 0.0
+            for name, df in data.items()
+        }
+        self.frame_sizes.update(sizes)
+        self._append([{"kind": "memory", "label": name, "mb": mb} for name, mb in sizes.items()])
+
+    def _append(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        base = {"ts": time.time(), "session": self.session_id, "page": self.page}
+        lines = "".join(json.dumps({**base, **r}) + "\n" for r in rows)
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            # single append per rerun keeps lines from concurrent replicas intact
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError:
+            pass
+
+    def _flush(self, cache_stats: dict | None) -> float:
+        total_ms = (time.perf_counter() - self._t0) * 1000
+        rows = list(self.events)
+        rows.append({"kind": "page", "label": self.page, "ms": total_ms, "cache": cache_stats})
+        self._append(rows)
+        self._t0 = None
+        return total_ms
+
+    def end(self, cache_stats: dict | None = None) -> None:
+        if self._t0 is None:
+            return
+        total_ms = self._flush(cache_stats)
+        if st.sidebar.toggle("Performance panel", key="perf_panel"):
+            self.render_panel(total_ms, cache_stats)
+
+    def render_panel(self, total_ms: float, cache_stats: dict | None) -> None:
+        with st.sidebar.expander("Performance", expanded=True):
+            st.metric("Page script time", f"{total_ms:,.0f} ms")
+            if self.events:
+                ev = pd.DataFrame(self.events)
+                ev["ms"] = ev["ms"].round(1)
+                st.dataframe(ev.sort_values("ms", ascending=False), use_container_width=True, hide_index=True)
+                st.caption("Time by stage: " + ", ".join(
+                    f"{k} {v:,.0f} ms" for k, v in ev.groupby("kind")["ms"].sum().items()
+                ))
+            if self.cache_data_hits or self.cache_data_misses:
+                st.caption(
+                    f"st.cache_data (this session): {self.cache_data_hits} hits / "
+                    f"{self.cache_data_misses} misses"
+                )
+            if cache_stats:
+                st.caption(
+                    f"Shared disk cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                    f"{cache_stats['entries']} entries, {cache_stats['size_mb']:.1f} MB"
+                )
+            if self.frame_sizes:
+                sizes = (pd.Series(self.frame_sizes, name="MB")
+                           .sort_values(ascending=False)
+                           .round(2)
+                           .rename_axis("dataset")
+                           .reset_index())
+                st.caption(f"Frames used by this page run: {sizes['MB'].sum():.1f} MB")
+                st.dataframe(sizes.head(10), use_container_width=True, hide_index=True)
+            st.caption(f"Log: {self.log_path}")
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+# Paging and lazy CSV export for large tables.
+# Only the rows of the requested page are materialized for display, and CSV downloads are
+# produced by a callable that Streamlit runs only when the button is actually clicked.
+
+def search_rows(df: pd.DataFrame, query: str, cols: list[str]) -> pd.DataFrame:
+    """Case-insensitive substring match on any of `cols`."""
+    query = (query or "").strip()
+    cols = [c for c in cols if c in df.columns]
+    if not query or not cols or df.empty:
+        return df
+    mask = np.zeros(len(df), dtype=bool)
+    for c in cols:
+        mask |= df[c].astype(str).str.contains(query, case=False, regex=False, na=False).to_numpy()
+    return df[mask]
+
+def table_page(
+    df: pd.DataFrame,
+    sort_by: str | None,
+    ascending: bool,
+    page: int,
+    page_size: int,
+) -> tuple[pd.DataFrame, int]:
+    """
+    Rows of one page (1-based) in sort order, plus the page count.
+    Only the sort key is ordered; the page rows are gathered by position.
+    """
+    n = len(df)
+    n_pages = max((n + page_size - 1) // page_size, 1)
+    page = min(max(int(page), 1), n_pages)
+    start = (page - 1) * page_size
+
+    if sort_by and sort_by in df.columns:
+        key = df[sort_by].reset_index(drop=True)
+        order = key.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        pos = order[start:start + page_size]
+    else:
+        pos = np.arange(start, min(start + page_size, n))
+    return df.iloc[pos], n_pages
+
+def lazy_csv(df: pd.DataFrame) -> Callable[[], bytes]:
+    """
+    Deferred CSV export for st.download_button(data=...): nothing is serialized on reruns,
+    only when the button is clicked. Returns bytes, one of the types Streamlit accepts from
+    a data callable (it holds the whole payload in memory either way).
+    """
+    def build() -> bytes:
+        return df.to_csv(index=False).encode("utf-8")
+
+    return build